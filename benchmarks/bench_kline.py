@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线图着色性能基准
+对比逐段ax.plot与单个LineCollection两种着色方式的耗时，并校验渲染结果一致
+用法: python benchmarks/bench_kline.py
+"""
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+from k_line import build_colored_segments, draw_kline  # noqa: E402
+
+SIZES = [240, 2400, 24000]
+REPEAT = 3
+
+
+def make_minute_bars(n, seed=0):
+    """生成n根模拟分钟线"""
+    rng = np.random.default_rng(seed)
+    change = np.round(rng.normal(0, 0.02, n), 2)
+    change[rng.random(n) < 0.2] = 0.0
+    price = np.round(10 + np.cumsum(change), 2)
+    return pd.DataFrame({
+        'trade_time': pd.date_range('2024-01-02 09:30', periods=n, freq='min'),
+        'price': price,
+        'change': change,
+        'change_pct': np.round(change / 10 * 100, 2),
+    })
+
+
+def legacy_color_segments(ax, df):
+    """旧实现：逐段调用ax.plot着色"""
+    for i in range(1, len(df)):
+        if df.iloc[i]['change'] > 0:
+            color = 'red'
+        elif df.iloc[i]['change'] < 0:
+            color = 'green'
+        else:
+            color = 'gray'
+        ax.plot([df.iloc[i-1]['trade_time'], df.iloc[i]['trade_time']],
+                [df.iloc[i-1]['price'], df.iloc[i]['price']],
+                color=color, linewidth=2, alpha=0.8)
+
+
+def render_pixels(fig):
+    """渲染图形并返回像素数组"""
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba()).copy()
+
+
+def vector_color_segments(ax, df):
+    """新实现：单个LineCollection着色"""
+    segments, colors = build_colored_segments(df['trade_time'].to_numpy(), df['price'].to_numpy(),
+                                              df['change'].to_numpy())
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=2, alpha=0.8,
+                                     capstyle='projecting', joinstyle='round'),
+                      autolim=False)
+
+
+def time_coloring(df, color_segments):
+    """计时：价格主线 + 着色 + 渲染"""
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(15, 8))
+    ax.plot(df['trade_time'], df['price'], linewidth=2, color='#1f77b4',
+            marker='o', markersize=3, markerfacecolor='white', markeredgewidth=1.5)
+    color_segments(ax, df)
+    fig.canvas.draw()
+    elapsed = time.perf_counter() - start
+    plt.close(fig)
+    return elapsed
+
+
+def check_identical(df):
+    """校验两种着色方式的像素差异"""
+    fig_new = draw_kline(df.copy(), '000001')
+    new_pixels = render_pixels(fig_new)
+    plt.close(fig_new)
+
+    # 将LineCollection替换为旧的逐段着色，其余元素保持不变
+    fig_old = draw_kline(df.copy(), '000001')
+    ax = fig_old.axes[0]
+    for collection in [c for c in ax.collections if isinstance(c, LineCollection)]:
+        collection.remove()
+    legacy_color_segments(ax, df)
+    old_pixels = render_pixels(fig_old)
+    plt.close(fig_old)
+
+    diff = np.abs(new_pixels.astype(int) - old_pixels.astype(int))
+    return (diff > 8).mean()
+
+
+def main():
+    print("🚀 K线图着色性能基准")
+    print("=" * 60)
+    print(f"{'数据点':>8} | {'逐段plot(s)':>12} | {'LineCollection(s)':>18} | {'加速比':>6}")
+    print("-" * 60)
+    for n in SIZES:
+        df = make_minute_bars(n)
+        legacy = min(time_coloring(df, legacy_color_segments) for _ in range(REPEAT if n < 24000 else 1))
+        new = min(time_coloring(df, vector_color_segments) for _ in range(REPEAT))
+        print(f"{n:>8} | {legacy:>12.3f} | {new:>18.3f} | {legacy / new:>5.1f}x")
+
+    mismatch = check_identical(make_minute_bars(240))
+    print("-" * 60)
+    print(f"🔍 240点像素差异比例: {mismatch:.4%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端性能基准
+离线运行（回放录制数据，没有录制数据时生成模拟数据），覆盖代码表查找、K线图渲染编码、概念统计、
+历史记录保存/读取和历史记录筛选；结果写成JSON，可与其他提交的结果对比
+
+用法:
+    python benchmarks/run_benchmarks.py                       # 结果写入 benchmarks/results/<提交>.json
+    python benchmarks/run_benchmarks.py --data-dir fixtures   # 使用 LHB_DATA_SOURCE=record 录制的数据
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<旧提交>.json
+    python benchmarks/run_benchmarks.py --filter kline        # 只运行名称包含kline的基准
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 不把仓库根目录加入路径，避免本地streamlit目录遮蔽streamlit库
+sys.path[:0] = [os.path.join(ROOT, 'function'), os.path.join(ROOT, 'streamlit')]
+from data_source import LiveDataSource, RecordingDataSource, ReplayDataSource, set_data_source  # noqa: E402
+from data_fetch import get_fetcher  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+REGRESSION_THRESHOLD = 1.2  # 中位数变慢超过该倍数视为退化
+FIXTURE_CODE = '600000'
+FIXTURE_DATE = '2024-06-28'
+KLINE_DPIS = [100, 200, 300]
+
+
+# ---------- 模拟数据 ----------
+
+def make_listing(n=5000, seed=0):
+    """模拟代码表"""
+    rng = np.random.default_rng(seed)
+    chars = list('安银行科技电子能源医药材料汽车智能信息通讯化工机械环保建设农业消费传媒软件光伏')
+    names = [''.join(rng.choice(chars, rng.integers(2, 5))) + str(i % 10) for i in range(n)]
+    codes = [f'{(600000 if i % 2 else 0) + i:06d}' for i in range(n)]
+    return pd.DataFrame({'stock_code': codes, 'short_name': names, 'exchange': ['SH'] * n})
+
+
+def make_minute_bars(stock_code, n=240, seed=0):
+    """模拟分钟线"""
+    rng = np.random.default_rng(seed)
+    change = np.round(rng.normal(0, 0.02, n), 2)
+    change[rng.random(n) < 0.2] = 0.0
+    price = np.round(10 + np.cumsum(change), 2)
+    return pd.DataFrame({
+        'stock_code': stock_code,
+        'trade_time': pd.date_range(f'{FIXTURE_DATE} 09:30', periods=n, freq='min').astype(str),
+        'price': price,
+        'change': change,
+        'change_pct': np.round(change / 10 * 100, 2),
+        'volume': rng.integers(100, 10000, n)
+    })
+
+
+def make_hot_list(n, seed=0):
+    """模拟热榜（含概念标签）"""
+    rng = np.random.default_rng(seed)
+    concepts = [f'概念{i}' for i in range(300)]
+    tags = [';'.join(rng.choice(concepts, rng.integers(1, 6), replace=False)) for _ in range(n)]
+    return pd.DataFrame({
+        'stock_code': [f'{600000 + i:06d}' for i in range(n)],
+        'short_name': [f'股票{i}' for i in range(n)],
+        'price': np.round(rng.uniform(2, 20, n), 2),
+        'change_pct': np.round(rng.normal(2, 3, n), 2),
+        'pop_tag': '',
+        'concept_tag': tags,
+        'volume': rng.integers(1000, 10 ** 7, n)
+    })
+
+
+def make_fixtures(data_dir):
+    """按接口录制格式写入模拟数据"""
+    fake = {
+        'all_code': lambda: make_listing(),
+        'market_min': lambda stock_code: make_minute_bars(stock_code),
+        'hot_rank_ths': lambda: make_hot_list(100)
+    }
+    recorder = RecordingDataSource(LiveDataSource(fake), data_dir)
+    recorder.call('all_code')
+    recorder.call('market_min', FIXTURE_CODE)
+    recorder.call('hot_rank_ths')
+
+
+# ---------- 计时 ----------
+
+def measure(func, rounds, warmup=1):
+    """运行func多次，返回耗时统计（秒）"""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'rounds': rounds
+    }
+
+
+# ---------- 基准 ----------
+
+def bench_symbol_lookup():
+    from symbol_index import SymbolIndex
+    from stock_search import StockSearchIndex
+    listing = get_fetcher().fetch('all_code')
+    index = SymbolIndex(listing)
+    search_index = StockSearchIndex(index)
+    codes = listing['stock_code'].tolist()[::5]
+    names = listing['short_name'].tolist()[::5]
+    return {
+        'symbol_index.build': measure(lambda: SymbolIndex(listing), 5),
+        'symbol_index.name_of_x1000': measure(lambda: [index.name_of(c) for c in codes], 20),
+        'symbol_index.code_of_x1000': measure(lambda: [index.code_of(n) for n in names], 20),
+        'stock_search.search': measure(lambda: [search_index.search(k) for k in ('6000', '银行', 'yh', '科技')], 20)
+    }
+
+
+def bench_kline():
+    from k_line import draw_kline, encode_figure
+    df = get_fetcher().fetch('market_min', FIXTURE_CODE)
+
+    def draw():
+        plt.close(draw_kline(df.copy(), FIXTURE_CODE))
+
+    results = {'kline.draw': measure(draw, 5)}
+    for dpi in KLINE_DPIS:
+        def render(dpi=dpi):
+            fig = draw_kline(df.copy(), FIXTURE_CODE)
+            encode_figure(fig, dpi=dpi)
+            plt.close(fig)
+        results[f'kline.draw_encode_png_dpi{dpi}'] = measure(render, 3)
+    return results
+
+
+def bench_concept_count():
+    from ths_hot import concept_count
+    hot_100 = get_fetcher().fetch('hot_rank_ths')
+    hot_10k = make_hot_list(10000, seed=1)
+    return {
+        'concept_count.rows100': measure(lambda: concept_count(hot_100), 20),
+        'concept_count.rows10k': measure(lambda: concept_count(hot_10k), 3)
+    }
+
+
+def fill_history(data_persistence, n):
+    """直接批量写入n条元数据记录（不含数据文件）"""
+    now = datetime.now()
+    types = ['stock_query', 'lhb_search', 'ths_hot', 'concept_count']
+    rows = [((now - timedelta(minutes=10 * i)).isoformat(), types[i % len(types)],
+             json.dumps({'stock_code': f'{i % 5000:06d}', 'stock_name': f'股票{i % 5000}'}, ensure_ascii=False), None)
+            for i in range(n)]
+    with data_persistence._conn:
+        data_persistence._conn.executemany(
+            "INSERT INTO operation_history (timestamp, operation_type, metadata, data_file) VALUES (?, ?, ?, ?)", rows)
+
+
+def bench_persistence():
+    df = get_fetcher().fetch('market_min', FIXTURE_CODE)
+    results = {}
+    for n in (100, 10000):
+        workdir = tempfile.mkdtemp(prefix='bench_history_')
+        cwd = os.getcwd()
+        # DataPersistence及其模块使用相对路径的目录，切换到临时目录后再导入
+        os.chdir(workdir)
+        try:
+            import utils_streamlit
+            dp = utils_streamlit.DataPersistence()
+            fill_history(dp, n)
+            dp.save_operation_history('stock_query', df, {'stock_code': FIXTURE_CODE})
+            data_file = dp.tail_operation_history(1)[0]['data_file']
+            since = datetime.now() - timedelta(days=7)
+            results.update({
+                f'history.save.entries{n}': measure(
+                    lambda: dp.save_operation_history('stock_query', df, {'stock_code': FIXTURE_CODE}), 20),
+                f'history.load_data.entries{n}': measure(lambda: dp.load_operation_data(data_file), 20),
+                f'history.load_head10.entries{n}': measure(lambda: dp.load_operation_data(data_file, head=10), 20),
+                f'history.tail5.entries{n}': measure(lambda: dp.tail_operation_history(5), 50),
+                f'history.filter_type_time.entries{n}': measure(
+                    lambda: (dp.count_operation_history('lhb_search', since),
+                             dp.query_operation_history('lhb_search', since, limit=10)), 50),
+                f'history.search_metadata.entries{n}': measure(
+                    lambda: dp.query_operation_history(keyword=FIXTURE_CODE, limit=10), 50),
+                f'history.count_by_day.entries{n}': measure(lambda: dp.count_by_day(since=since), 20)
+            })
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+BENCHMARKS = [bench_symbol_lookup, bench_kline, bench_concept_count, bench_persistence]
+
+
+# ---------- 结果 ----------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+def compare(results, baseline_file):
+    """与基线结果对比中位数，返回退化的基准名称"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    regressions = []
+    print(f"\n📊 对比基线: {baseline_file}")
+    print(f"{'基准':<42} | {'基线(ms)':>10} | {'当前(ms)':>10} | {'比值':>6}")
+    print("-" * 78)
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        ratio = stats['median'] / baseline[name]['median'] if baseline[name]['median'] else float('inf')
+        flag = ' ⚠️' if ratio > REGRESSION_THRESHOLD else ''
+        print(f"{name:<42} | {baseline[name]['median'] * 1000:>10.3f} | {stats['median'] * 1000:>10.3f} | "
+              f"{ratio:>5.2f}x{flag}")
+        if ratio > REGRESSION_THRESHOLD:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线性能基准')
+    parser.add_argument('--data-dir', help='录制数据目录（LHB_DATA_SOURCE=record生成），缺省时使用模拟数据')
+    parser.add_argument('--output', help='结果JSON文件路径')
+    parser.add_argument('--compare', help='基线结果JSON，中位数变慢超过阈值时返回非0退出码')
+    parser.add_argument('--filter', default='', help='只运行名称包含该字符串的基准')
+    args = parser.parse_args()
+
+    temp_dir = None
+    data_dir = args.data_dir
+    if not data_dir:
+        temp_dir = data_dir = tempfile.mkdtemp(prefix='bench_fixtures_')
+        make_fixtures(data_dir)
+    set_data_source(ReplayDataSource(data_dir))
+
+    print("🚀 端到端性能基准")
+    print("=" * 78)
+    results = {}
+    try:
+        for bench in BENCHMARKS:
+            if args.filter and args.filter not in bench.__name__:
+                continue
+            for name, stats in bench().items():
+                results[name] = stats
+                print(f"{name:<42} | 中位数 {stats['median'] * 1000:>10.3f} ms | 最小 {stats['min'] * 1000:>10.3f} ms")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'data': args.data_dir or 'synthetic'
+        },
+        'results': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit[:8]}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 结果已写入 {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 个基准变慢超过 {REGRESSION_THRESHOLD:.1f} 倍: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ 没有发现性能退化")
+
+
+if __name__ == "__main__":
+    main()
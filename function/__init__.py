@@ -1,25 +1,25 @@
 # function模块初始化文件
+# function目录中的模块互相按模块名导入（例如 from data_fetch import get_fetcher），
+# 这里把function目录加入sys.path，页面层同样按模块名导入，进程内每个模块只加载一份：
+# 共享同一个数据调用层（线程池、按主机限速）、同一个数据库连接池和同一份性能计时
+# 不要使用 import function.xxx / from function.xxx import ...，那样会以另一个名称再加载一份模块
+import importlib
+import os
+import sys
 
-# 导入所有功能模块
-try:
-    from . import api_search_draw
-    from . import db_search_draw
-    from . import find_lhs
-    from . import ths_hot
-    from . import db_connect
-    from . import flush_db
-    from . import k_line
-    from . import trade_day
-except ImportError:
-    # 如果相对导入失败，尝试绝对导入
-    try:
-        import api_search_draw
-        import db_search_draw
-        import find_lhs
-        import ths_hot
-        import db_connect
-        import flush_db
-        import k_line
-        import trade_day
-    except ImportError:
-        pass
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+if FUNCTION_DIR not in sys.path:
+    sys.path.insert(0, FUNCTION_DIR)
+
+MODULE_NAMES = [
+    'api_search_draw', 'db_search_draw', 'find_lhs', 'ths_hot', 'db_connect', 'flush_db', 'k_line',
+    'trade_day', 'kline_cache', 'symbol_index', 'stock_search', 'lhb_cache', 'data_fetch', 'data_source',
+    'perf', 'schema', 'range_index', 'screener', 'quote_fetch', 'hot_refresher'
+]
+
+
+def __getattr__(name):
+    """from function import xxx 返回按模块名导入的同一个模块（用到时才导入）"""
+    if name in MODULE_NAMES:
+        return importlib.import_module(name)
+    raise AttributeError(f"module 'function' has no attribute '{name}'")
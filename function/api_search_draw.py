@@ -1,19 +1,18 @@
 # 用接口找股票并画图
-import adata
 from k_line import draw_kline
+from data_fetch import get_fetcher
+from symbol_index import get_symbol_index
 
 
 def api_search_code_draw(short_name):
-    find_code = adata.stock.info.all_code()
-    find_code = find_code[find_code['short_name'] == short_name]
-    if not find_code.empty:
-        stock_code = find_code['stock_code'].values[0]
+    stock_code = api_get_stock_code(short_name)
+    if stock_code:
         print(f"股票代码是: {stock_code}")
     else:
         print("未找到相关股票")
         return None
-    
-    k_data = adata.stock.market.get_market_min(stock_code)
+
+    k_data = get_fetcher().fetch('market_min', stock_code)
     fig = draw_kline(k_data, stock_code)
     # 如果需要显示图形，可以调用 plt.show()
     import matplotlib.pyplot as plt
@@ -22,18 +21,31 @@ def api_search_code_draw(short_name):
 
 
 def api_search_name_draw(stock_code):
-    find_code = adata.stock.info.all_code()
-    find_code = find_code[find_code['stock_code'] == stock_code]
-    if not find_code.empty:
-        short_name = find_code['short_name'].values[0]
+    short_name = api_get_stock_name(stock_code)
+    if short_name:
         print(f"股票名字是: {short_name}")
     else:
         print("未找到相关股票")
         return None
-    
-    k_data = adata.stock.market.get_market_min(stock_code)
+
+    k_data = get_fetcher().fetch('market_min', stock_code)
     fig = draw_kline(k_data, stock_code)
     # 如果需要显示图形，可以调用 plt.show()
     import matplotlib.pyplot as plt
     plt.show()
-    return fig
\ No newline at end of file
+    return fig
+
+
+def api_get_stock_name(stock_code):
+    """通过接口代码表获取股票名称（不绘图）"""
+    return get_symbol_index('api').name_of(stock_code)
+
+
+def api_get_stock_code(short_name):
+    """通过接口代码表获取股票代码（不绘图）"""
+    return get_symbol_index('api').code_of(short_name)
+
+
+def api_get_stock_listing():
+    """获取接口代码表（DataFrame）"""
+    return get_symbol_index('api').to_frame()
@@ -0,0 +1,160 @@
+# 数据请求工具
+# 按数据源主机限速，避免并发请求时被接口封禁；所有数据接口通过统一的调用层并发执行，带超时和失败重试
+# 取到的结果按schema.SCHEMAS统一转换列类型
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from data_source import get_data_source
+from perf import span
+from schema import normalize
+
+DEFAULT_HOST_RATE = 5.0  # 每秒请求数
+
+# 各数据源主机的限速（每秒请求数）
+HOST_RATE_LIMITS = {
+    'datacenter-web.eastmoney.com': 5.0,  # 龙虎榜
+    'push2.eastmoney.com': 10.0,
+    'dq.10jqka.com.cn': 5.0,              # 同花顺热榜
+    'basic.10jqka.com.cn': 5.0,           # 同花顺个股概念
+    'page3.tdx.com.cn': 2.0               # 通达信扫雷
+}
+
+
+class RateLimiter:
+    """令牌桶限速器：平均每秒rate次请求，最多允许burst次突发"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def get_host_limiter(host):
+    """获取某个主机共享的限速器"""
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            _host_limiters[host] = RateLimiter(HOST_RATE_LIMITS.get(host, DEFAULT_HOST_RATE))
+        return _host_limiters[host]
+
+
+FETCH_MAX_WORKERS = 16   # 调用层线程池大小
+FETCH_RETRIES = 2        # 失败后的重试次数
+FETCH_BACKOFF = 0.5      # 重试等待的基数（秒），按2的指数增长并加随机抖动
+DEFAULT_TIMEOUT = 20.0
+
+# 数据接口：名称 -> (数据源主机, 超时秒数)，接口名称与data_source.ADATA_ENDPOINTS一致
+# 超时从提交开始计算，包含限速等待和重试
+ENDPOINTS = {
+    'market_min': ('push2his.eastmoney.com', 20.0),
+    'market_current': ('push2.eastmoney.com', 20.0),
+    'hot_rank_ths': ('dq.10jqka.com.cn', 15.0),
+    'lhb_daily': ('datacenter-web.eastmoney.com', 20.0),
+    'lhb_info': ('datacenter-web.eastmoney.com', 20.0),
+    'mine_clearance': ('page3.tdx.com.cn', 15.0),
+    'trade_calendar': ('www.szse.cn', 30.0),
+    'all_code': ('www.szse.cn', 60.0),
+    'concept_ths': ('basic.10jqka.com.cn', 15.0)
+}
+# 这些错误重试也不会成功（例如回放模式下缺少录制数据），直接抛出
+NO_RETRY_ERRORS = (LookupError,)
+
+
+class FetchTimeout(TimeoutError):
+    """接口调用超时"""
+
+
+class DataFetcher:
+    """数据接口的统一调用层：线程池并发执行，按接口超时，失败后退避重试，按主机限速
+
+    source为DataSource，缺省时使用进程内共享的数据源（由环境变量选择live/record/replay）
+    """
+
+    def __init__(self, source=None, endpoints=None, max_workers=FETCH_MAX_WORKERS,
+                 retries=FETCH_RETRIES, backoff=FETCH_BACKOFF):
+        self.source = source
+        self.endpoints = endpoints or ENDPOINTS
+        self.retries = retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='data_fetch')
+
+    def timeout_of(self, endpoint):
+        return self.endpoints.get(endpoint, (None, DEFAULT_TIMEOUT))[1]
+
+    def call(self, endpoint, *args, **kwargs):
+        """在当前线程调用接口（限速+重试，不限制超时），结果转换为统一的列类型"""
+        source = self.source or get_data_source()
+        # 回放的数据不经过网络，无需限速
+        host = self.endpoints.get(endpoint, (None, None))[0] if source.name != 'replay' else None
+        for attempt in range(self.retries + 1):
+            if host:
+                get_host_limiter(host).acquire()
+            try:
+                with span(f'fetch.{endpoint}'):
+                    result = source.call(endpoint, *args, **kwargs)
+                return normalize(endpoint, result)
+            except NO_RETRY_ERRORS:
+                raise
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                wait = self.backoff * (2 ** attempt) * (1 + random.random())
+                print(f"{endpoint}请求失败，{wait:.1f}秒后重试: {e}")
+                time.sleep(wait)
+
+    def submit(self, endpoint, *args, **kwargs):
+        """提交到线程池异步调用，返回Future，用result()取结果"""
+        # 在提交时的上下文中执行，计时归入发起请求
+        future = self.executor.submit(contextvars.copy_context().run, self.call, endpoint, *args, **kwargs)
+        future.endpoint = endpoint
+        future.deadline = time.monotonic() + self.timeout_of(endpoint)
+        return future
+
+    @staticmethod
+    def result(future):
+        """等待异步调用的结果，超过接口超时抛出FetchTimeout"""
+        try:
+            return future.result(timeout=max(0.0, future.deadline - time.monotonic()))
+        except FutureTimeoutError:
+            # 线程无法被强制中断，请求在后台结束后结果被丢弃
+            future.cancel()
+            raise FetchTimeout(f"{future.endpoint}请求超时")
+
+    def fetch(self, endpoint, *args, **kwargs):
+        """调用接口并等待结果（带超时）"""
+        return self.result(self.submit(endpoint, *args, **kwargs))
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """获取进程内共享的数据调用层"""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = DataFetcher()
+    return _fetcher
@@ -0,0 +1,155 @@
+# 数据源
+# 所有adata接口调用都经过DataSource：live直接请求接口，record请求接口并把结果保存到本地，replay只从本地读取
+# 通过环境变量选择：LHB_DATA_SOURCE=live/record/replay，LHB_DATA_DIR=录制目录，LHB_REPLAY_LATENCY=回放延迟（秒）
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+DATA_SOURCE_ENV = 'LHB_DATA_SOURCE'
+DATA_DIR_ENV = 'LHB_DATA_DIR'
+REPLAY_LATENCY_ENV = 'LHB_REPLAY_LATENCY'
+DEFAULT_DATA_DIR = 'fixtures'
+
+# 接口名称 -> adata中的调用路径
+ADATA_ENDPOINTS = {
+    'market_min': 'stock.market.get_market_min',
+    'market_current': 'stock.market.list_market_current',
+    'hot_rank_ths': 'sentiment.hot.hot_rank_100_ths',
+    'lhb_daily': 'sentiment.hot.list_a_list_daily',
+    'lhb_info': 'sentiment.hot.get_a_list_info',
+    'mine_clearance': 'sentiment.mine.mine_clearance_tdx',
+    'trade_calendar': 'stock.info.trade_calendar',
+    'all_code': 'stock.info.all_code',
+    'concept_ths': 'stock.info.get_concept_ths'
+}
+
+
+class FixtureNotFound(LookupError):
+    """回放模式下没有找到对应请求的录制数据"""
+
+
+def request_key(endpoint, args, kwargs):
+    """请求的唯一标识：接口名称+参数"""
+    text = repr((endpoint, tuple(args), sorted(kwargs.items())))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class DataSource:
+    """数据源接口：call(接口名称, *参数)返回接口结果"""
+
+    name = 'base'
+
+    def call(self, endpoint, *args, **kwargs):
+        raise NotImplementedError
+
+
+class LiveDataSource(DataSource):
+    """直接请求adata接口；backend可替换为具有相同调用路径的对象，或{接口名称: 函数}字典"""
+
+    name = 'live'
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def call(self, endpoint, *args, **kwargs):
+        backend = self.backend
+        if backend is None:
+            import adata
+            backend = adata
+        if isinstance(backend, dict):
+            return backend[endpoint](*args, **kwargs)
+        func = backend
+        for attr in ADATA_ENDPOINTS[endpoint].split('.'):
+            func = getattr(func, attr)
+        return func(*args, **kwargs)
+
+
+class RecordingDataSource(DataSource):
+    """请求上游数据源，并把每个请求的结果保存到本地目录，供回放使用"""
+
+    name = 'record'
+
+    def __init__(self, inner=None, data_dir=DEFAULT_DATA_DIR):
+        self.inner = inner or LiveDataSource()
+        self.data_dir = data_dir
+
+    def call(self, endpoint, *args, **kwargs):
+        result = self.inner.call(endpoint, *args, **kwargs)
+        path = fixture_path(self.data_dir, endpoint, args, kwargs)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'endpoint': endpoint, 'args': args, 'kwargs': kwargs, 'result': result}, f)
+        os.replace(tmp_path, path)
+        return result
+
+
+class ReplayDataSource(DataSource):
+    """从录制目录读取结果，不访问网络；latency模拟接口耗时（秒）"""
+
+    name = 'replay'
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR, latency=0.0):
+        self.data_dir = data_dir
+        self.latency = latency
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def call(self, endpoint, *args, **kwargs):
+        path = fixture_path(self.data_dir, endpoint, args, kwargs)
+        with self._lock:
+            record = self._cache.get(path)
+        if record is None:
+            if not os.path.exists(path):
+                raise FixtureNotFound(f"没有录制数据: {endpoint}{args}{kwargs or ''}")
+            with open(path, 'rb') as f:
+                record = pickle.load(f)
+            with self._lock:
+                self._cache[path] = record
+        if self.latency:
+            time.sleep(self.latency)
+        # 返回副本，调用方修改结果不影响后续回放
+        result = record['result']
+        return result.copy() if hasattr(result, 'copy') else result
+
+
+def fixture_path(data_dir, endpoint, args, kwargs):
+    return os.path.join(data_dir, endpoint, request_key(endpoint, args, kwargs) + '.pkl')
+
+
+def create_data_source(kind=None, data_dir=None, latency=None):
+    """按名称创建数据源，参数缺省时读取环境变量"""
+    kind = (kind or os.environ.get(DATA_SOURCE_ENV) or 'live').lower()
+    data_dir = data_dir or os.environ.get(DATA_DIR_ENV) or DEFAULT_DATA_DIR
+    if latency is None:
+        latency = float(os.environ.get(REPLAY_LATENCY_ENV) or 0)
+    if kind == 'live':
+        return LiveDataSource()
+    if kind == 'record':
+        return RecordingDataSource(LiveDataSource(), data_dir)
+    if kind == 'replay':
+        return ReplayDataSource(data_dir, latency)
+    raise ValueError(f"未知的数据源: {kind}（可选 live/record/replay）")
+
+
+_data_source = None
+_data_source_lock = threading.Lock()
+
+
+def get_data_source():
+    """获取进程内共享的数据源（首次使用时按环境变量创建）"""
+    global _data_source
+    if _data_source is None:
+        with _data_source_lock:
+            if _data_source is None:
+                _data_source = create_data_source()
+    return _data_source
+
+
+def set_data_source(source):
+    """替换进程内共享的数据源，None表示下次使用时按环境变量重新创建"""
+    global _data_source
+    with _data_source_lock:
+        _data_source = source
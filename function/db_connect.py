@@ -2,30 +2,108 @@
 # 数据库连接测试
 # !initctl status mysql
 # !service mysql start
+import os
+import threading
+import time
+from contextlib import contextmanager
 import pandas as pd
-from sqlalchemy import create_engine
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from perf import span
 # from kaggle_secrets import UserSecretsClient
 
 
-def db_connect():
+# 连接池配置（可通过环境变量覆盖）
+POOL_CONFIG = {
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),            # 常驻连接数
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),     # 高峰期允许额外创建的连接数
+    "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "0") == "1",  # 取连接前是否先ping一次
+    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 280)),    # 连接最长复用秒数，避免被服务端断开
+    "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30))      # 等待空闲连接的超时秒数
+}
+
+_engine = None
+_engine_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_pool_stats = {
+    "checkouts": 0,         # 从连接池取连接的次数
+    "new_connections": 0,   # 新建物理连接的次数（TCP/TLS握手）
+    "checkout_time_total": 0.0,
+    "checkout_time_max": 0.0
+}
+
+
+def get_db_url():
     # user_secrets = UserSecretsClient()
     secret_value_0 = ""
     # user_secrets.get_secret("all_stock")
-    
-    
-    # 创建数据库引擎
+
     db_user = 'all_stock'
     db_password = secret_value_0  # 替换为您的密码
     db_host = 'mysql2.sqlpub.com'  # 如果您的数据库在其他主机上，请更改为相应的主机名或IP
     db_port = '3307'
     db_name = 'all_stock'  # 替换为您的数据库名
-    
-    # 使用 SQLAlchemy 创建数据库连接
-    engine = create_engine(f'mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}')
-    
+    return f'mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
+
+
+def _on_connect(dbapi_connection, connection_record):
+    with _stats_lock:
+        _pool_stats["new_connections"] += 1
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    with _stats_lock:
+        _pool_stats["checkouts"] += 1
+
+
+def get_engine():
+    """获取进程内共享的数据库引擎，首次调用时才创建连接池"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(get_db_url(), **POOL_CONFIG)
+                event.listen(engine, "connect", _on_connect)
+                event.listen(engine, "checkout", _on_checkout)
+                _engine = engine
+    return _engine
+
+
+@contextmanager
+def engine_connection():
+    """从连接池取出一个连接，并记录取连接耗时"""
+    start = time.perf_counter()
+    connection = get_engine().connect()
+    elapsed = time.perf_counter() - start
+    with _stats_lock:
+        _pool_stats["checkout_time_total"] += elapsed
+        _pool_stats["checkout_time_max"] = max(_pool_stats["checkout_time_max"], elapsed)
+    try:
+        with span('mysql.connection'):
+            yield connection
+    finally:
+        connection.close()  # 归还到连接池
+
+
+def get_pool_stats():
+    """获取连接池统计：取连接次数、复用命中次数、取连接耗时"""
+    with _stats_lock:
+        stats = dict(_pool_stats)
+    checkouts = stats["checkouts"]
+    stats["pool_hits"] = max(0, checkouts - stats["new_connections"])
+    stats["hit_rate"] = stats["pool_hits"] / checkouts if checkouts else 0.0
+    stats["checkout_ms_avg"] = stats["checkout_time_total"] / checkouts * 1000 if checkouts else 0.0
+    stats["checkout_ms_max"] = stats.pop("checkout_time_max") * 1000
+    stats.pop("checkout_time_total")
+    stats["pool_status"] = _engine.pool.status() if _engine is not None else "未创建"
+    return stats
+
+
+def db_connect():
+    """测试数据库连接，返回共享的数据库引擎"""
+    engine = get_engine()
+
     # 测试数据库连接
-    with engine.connect() as connection:
+    with engine_connection() as connection:
         result = connection.execute(text("SELECT 1"))
         for row in result:
             print(row)
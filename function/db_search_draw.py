@@ -1,19 +1,30 @@
 # 用数据库找股票名画k线图
 # 推荐使用pandas方式
-import adata
 import pandas as pd
 from k_line import draw_kline
-from db_connect import db_connect
+from data_fetch import get_fetcher
+from db_connect import engine_connection, get_engine
+from symbol_index import get_symbol_index, register_symbol_source
+from stock_search import MATCH_LABELS, search_stocks
+from perf import timed
+
+
+@timed('symbols.load_db')
+def _load_db_listing():
+    """一次性读取数据库中的全部股票代码和名称"""
+    query = "SELECT stock_code, short_name FROM all_stock"
+    with engine_connection() as connection:
+        return pd.read_sql_query(query, connection)
+
+
+register_symbol_source('db', _load_db_listing)
 
 
 def database_search_name_draw(short_name):
-    engine = db_connect()  # 获取数据库引擎
-    query = "SELECT stock_code, short_name FROM all_stock WHERE short_name = %s"
-    find_code = pd.read_sql_query(query, engine, params=(short_name,))
-    if not find_code.empty:
-        stock_code = find_code.iloc[0]['stock_code']
+    stock_code = database_get_stock_code(short_name)
+    if stock_code:
         print(f"股票代码是: {stock_code}")
-        k_data = adata.stock.market.get_market_min(stock_code)
+        k_data = get_fetcher().fetch('market_min', stock_code)
         fig = draw_kline(k_data, stock_code)
         # 如果需要显示图形，可以调用 plt.show()
         import matplotlib.pyplot as plt
@@ -25,13 +36,10 @@ def database_search_name_draw(short_name):
 
 
 def database_search_code_draw(stock_code):
-    engine = db_connect()  # 获取数据库引擎
-    query = "SELECT stock_code, short_name FROM all_stock WHERE stock_code = %s"
-    find_code = pd.read_sql_query(query, engine, params=(stock_code,))
-    if not find_code.empty:
-        short_name = find_code.iloc[0]['short_name']
+    short_name = database_get_stock_name(stock_code)
+    if short_name:
         print(f"股票名称是: {short_name}")
-        k_data = adata.stock.market.get_market_min(stock_code)
+        k_data = get_fetcher().fetch('market_min', stock_code)
         fig = draw_kline(k_data, stock_code)
         # 如果需要显示图形，可以调用 plt.show()
         import matplotlib.pyplot as plt
@@ -42,38 +50,33 @@ def database_search_code_draw(stock_code):
         return None
 
 
+@timed('db_search.fuzzy_search')
 def database_fuzzy_search(keyword):
-    """数据库模糊查询股票"""
-    engine = db_connect()  # 获取数据库引擎
-    query = "SELECT stock_code, short_name FROM all_stock WHERE short_name LIKE %s"
-    result = pd.read_sql_query(query, engine, params=(f'%{keyword}%',))
+    """数据库模糊查询股票（代码前缀/名称包含/拼音首字母，在内存索引中完成）"""
+    result = database_search_stocks(keyword, limit=None)
     if not result.empty:
-        print(f"找到 {len(result)} 只包含'{keyword}'的股票:")
-        for _, row in result.iterrows():
-            print(f"  {row['short_name']} ({row['stock_code']})")
+        print(f"找到 {len(result)} 只匹配'{keyword}'的股票:")
+        print('\n'.join(f"  {name} ({code})" for code, name in zip(result['stock_code'], result['short_name'])))
         return result
     else:
         print(f"未找到包含'{keyword}'的股票")
         return None
 
 
+def database_search_stocks(keyword, limit=10):
+    """边输入边搜索：返回按匹配程度排序的前limit只股票"""
+    matches = search_stocks(keyword, limit, source='db')
+    return pd.DataFrame(
+        [(code, name, MATCH_LABELS[match_type]) for code, name, match_type in matches],
+        columns=['stock_code', 'short_name', 'match_type']
+    )
+
+
 def database_get_stock_name(stock_code):
     """从数据库获取股票名称（不绘图）"""
-    engine = db_connect()  # 获取数据库引擎
-    query = "SELECT stock_code, short_name FROM all_stock WHERE stock_code = %s"
-    find_code = pd.read_sql_query(query, engine, params=(stock_code,))
-    if not find_code.empty:
-        return find_code.iloc[0]['short_name']
-    else:
-        return None
+    return get_symbol_index('db').name_of(stock_code)
 
 
 def database_get_stock_code(short_name):
     """从数据库获取股票代码（不绘图）"""
-    engine = db_connect()  # 获取数据库引擎
-    query = "SELECT stock_code, short_name FROM all_stock WHERE short_name = %s"
-    find_code = pd.read_sql_query(query, engine, params=(short_name,))
-    if not find_code.empty:
-        return find_code.iloc[0]['stock_code']
-    else:
-        return None
\ No newline at end of file
+    return get_symbol_index('db').code_of(short_name)
@@ -1,56 +1,143 @@
 # 龙虎榜函数
-import adata
+import contextvars
+import threading
 import warnings
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from trade_day import get_last_trading_day, is_trading_day
-report_date = get_last_trading_day()  # 使用最近的交易日
+from trade_day import DATA_READY_TIME, get_last_trading_day, is_trading_day
+from lhb_cache import get_lhb_cache
+from data_fetch import get_fetcher
+from perf import timed
 
+LHB_MAX_WORKERS = 8  # 批量获取明细时的最大并发数
+LHB_NEED_COLUMNS = ['a_net_amount', 'a_buy_amount', 'a_sell_amount', 'operate_name']
 
-def find_lhb(stock_code):
+# 报告日期在首次使用时才计算（导入模块时不做任何网络请求），跨天或跨过数据发布时间后自动刷新
+_report_date = None
+_report_date_key = None
+_report_date_lock = threading.Lock()
+
+
+def get_report_date(refresh=False):
+    """获取龙虎榜报告日期（最近一个有数据的交易日）"""
+    global _report_date, _report_date_key
+    now = datetime.now()
+    key = (now.date(), now.time() >= DATA_READY_TIME)
+    if refresh or _report_date_key != key:
+        with _report_date_lock:
+            if refresh or _report_date_key != key:
+                _report_date = get_last_trading_day()  # 使用最近的交易日
+                _report_date_key = key
+    return _report_date
+
+
+@timed('lhb.find_lhb')
+def find_lhb(stock_code, report_date=None):
     stock_code = stock_code
+    report_date = report_date or get_report_date()
     warnings.filterwarnings('ignore', category=RuntimeWarning, module='pandas')
-    need_columns = ['a_net_amount', 'a_buy_amount', 'a_sell_amount', 'operate_name']
-    if 'lh' not in find_lhb.__dict__:
-        find_lhb.lh = adata.sentiment.hot.list_a_list_daily(report_date)
+    cache = get_lhb_cache()
+    
+    # 当日榜单尚未缓存且输入的是股票代码时，榜单和明细同时请求，不在榜单上时丢弃明细
+    detail_future = None
+    if cache.peek(report_date) is None and str(stock_code).isdigit():
+        detail_future = get_fetcher().submit('lhb_info', stock_code, report_date)
+    daily = cache.get(report_date)
     
-    # 检查是否为股票代码
-    if stock_code in find_lhb.lh['stock_code'].values:
-        lhb = adata.sentiment.hot.get_a_list_info(stock_code, report_date)[need_columns]
+    # 股票代码或股票名称都通过索引直接解析为代码
+    actual_stock_code = daily.resolve_code(stock_code)
+    if actual_stock_code is not None:
+        if detail_future is not None and actual_stock_code == stock_code:
+            return get_fetcher().result(detail_future)[LHB_NEED_COLUMNS]
+        lhb = _get_lhb_detail(actual_stock_code, report_date)
         return lhb
-    # 检查是否为股票名称
-    elif 'short_name' in find_lhb.lh.columns and stock_code in find_lhb.lh['short_name'].values:
-        # 通过股票名称找到对应的股票代码
-        stock_row = find_lhb.lh[find_lhb.lh['short_name'] == stock_code]
-        if not stock_row.empty:
-            actual_stock_code = stock_row['stock_code'].iloc[0]
-            lhb = adata.sentiment.hot.get_a_list_info(actual_stock_code, report_date)[need_columns]
-            return lhb
     else:
         print(f"{stock_code}没有上龙虎榜！")
         return None
 
 
-def search_in_lh(stock_code):
-    lh = adata.sentiment.hot.list_a_list_daily(report_date)
+@timed('lhb.search_in_lh')
+def search_in_lh(stock_code, report_date=None):
+    report_date = report_date or get_report_date()
+    daily = get_lhb_cache().get(report_date)
     
-    # 检查是否为股票代码
-    if stock_code in lh['stock_code'].values:
+    # 获取该股票的所有数据（代码或名称均可）
+    stock_found = daily.rows_for(stock_code)
+    if stock_found is None:
+        print(f"未找到{stock_code}")
+        return None
+    if stock_code in daily.code_to_rows:
         print(f"找到了{stock_code},可以find_lhb({stock_code})查询")
-        # 获取该股票的所有数据
-        stock_found = lh[lh['stock_code'] == stock_code]
-        return stock_found
-    # 检查是否为股票名称
-    elif 'short_name' in lh.columns and stock_code in lh['short_name'].values:
-        print(f"通过股票名称找到了{stock_code},可以find_lhb({stock_code})查询")
-        # 获取该股票的所有数据
-        stock_found = lh[lh['short_name'] == stock_code]
-        return stock_found
     else:
-        print(f"未找到{stock_code}")
+        print(f"通过股票名称找到了{stock_code},可以find_lhb({stock_code})查询")
+    return stock_found
+
+
+def _get_lhb_detail(stock_code, report_date):
+    """获取单只股票的龙虎榜明细（调用层负责限速、超时和重试）"""
+    return get_fetcher().fetch('lhb_info', stock_code, report_date)[LHB_NEED_COLUMNS]
+
+
+def list_lhb_codes(report_date=None):
+    """获取当日龙虎榜上的全部股票代码"""
+    report_date = report_date or get_report_date()
+    return list(get_lhb_cache().get(report_date).code_to_rows)
+
+
+def resolve_lhb_codes(codes, report_date=None):
+    """把股票代码或名称解析为榜单中的股票代码并去重，返回(解析出的代码, 不在榜单中的输入)，都按输入顺序排列"""
+    daily = get_lhb_cache().get(report_date or get_report_date())
+    resolved_codes = {}
+    missing = {}
+    for code in codes:
+        actual_stock_code = daily.resolve_code(code)
+        if actual_stock_code is None:
+            missing[code] = None
+        else:
+            resolved_codes[actual_stock_code] = None
+    return list(resolved_codes), list(missing)
+
+
+def iter_lhb_many(codes, report_date=None, max_workers=LHB_MAX_WORKERS):
+    """并发获取多只股票的龙虎榜明细，按完成顺序逐个返回(股票代码, 明细, 错误信息)；输入先经resolve_lhb_codes解析去重"""
+    report_date = report_date or get_report_date()
+    warnings.filterwarnings('ignore', category=RuntimeWarning, module='pandas')
+    resolved_codes, missing = resolve_lhb_codes(codes, report_date)
+    for code in missing:
+        yield code, None, "没有上龙虎榜"
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # 每个任务复制当前上下文，计时仍归入发起请求
+        futures = {executor.submit(contextvars.copy_context().run, _get_lhb_detail, code, report_date): code
+                   for code in resolved_codes}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                detail = future.result().copy()
+                detail.insert(0, 'stock_code', code)
+                yield code, detail, None
+            except Exception as e:
+                yield code, None, str(e)
+
+
+@timed('lhb.find_lhb_many')
+def find_lhb_many(codes, report_date=None, max_workers=LHB_MAX_WORKERS):
+    """批量获取龙虎榜明细，合并为带stock_code列的长表（按输入顺序排列）"""
+    report_date = report_date or get_report_date()
+    results = {}
+    for code, detail, error in iter_lhb_many(codes, report_date, max_workers):
+        if detail is not None:
+            results[code] = detail
+        else:
+            print(f"{code}: {error}")
+    if not results:
         return None
+    daily = get_lhb_cache().get(report_date)
+    order = dict.fromkeys(daily.resolve_code(code) for code in codes)
+    return pd.concat([results[code] for code in order if code in results], ignore_index=True)
 
 
 def stock_risk(stock_code):
-    risk = adata.sentiment.mine.mine_clearance_tdx(stock_code)
+    risk = get_fetcher().fetch('mine_clearance', stock_code)
     return risk
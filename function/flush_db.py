@@ -1,13 +1,13 @@
 # all_stock写入数据库
-import adata
 import pandas as pd
+from data_fetch import get_fetcher
 from sqlalchemy import create_engine, text
 
 
 
 def flush_database():
     # 调用接口获取所有股票代码
-    all_df = adata.stock.info.all_code()
+    all_df = get_fetcher().fetch('all_code')
     
     # 筛选A股且非创业板的数据
     filtered_all_df = all_df[
@@ -0,0 +1,184 @@
+# 热榜实时刷新
+# 一个后台线程按固定间隔获取同花顺热榜，所有会话共享同一份快照，避免每个用户各自请求接口
+# 每次刷新与上一份快照比较，得到行级变化（新上榜、跌出榜单、排名变化），只把变化交给回调保存
+# 一段时间没有会话查看时暂停请求，再次有人查看时恢复
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from data_fetch import get_fetcher
+from ths_hot import ConceptCounter
+from perf import span
+
+HOT_REFRESH_INTERVAL = 60    # 默认刷新间隔（秒）
+HOT_MIN_INTERVAL = 10        # 最短刷新间隔（秒），避免被接口封禁
+HOT_IDLE_TIMEOUT = 300       # 超过该时间（秒）没有会话查看则暂停刷新
+HOT_RECENT_CHANGES = 500     # 保留最近多少条变化
+HOT_COLUMNS = ['rank', 'stock_code', 'short_name', 'change_pct', 'pop_tag', 'concept_tag']
+DIFF_COLUMNS = ['stock_code', 'short_name', 'change', 'old_rank', 'new_rank', 'rank_delta']
+
+CHANGE_ENTRY = '新上榜'
+CHANGE_EXIT = '跌出榜单'
+CHANGE_UP = '排名上升'
+CHANGE_DOWN = '排名下降'
+
+
+def _ranked(hot_list):
+    """保证有rank列（没有时按行顺序），以股票代码为键"""
+    hot_list = hot_list.drop_duplicates('stock_code')
+    if 'rank' not in hot_list.columns:
+        hot_list = hot_list.assign(rank=np.arange(1, len(hot_list) + 1))
+    return hot_list
+
+
+def diff_hot_lists(previous, current):
+    """比较两份热榜，返回行级变化：新上榜、跌出榜单、排名变化（rank_delta为正表示排名上升）"""
+    if previous is None or previous.empty:
+        return pd.DataFrame(columns=DIFF_COLUMNS)
+    previous = _ranked(previous)[['stock_code', 'short_name', 'rank']]
+    current = _ranked(current)[['stock_code', 'short_name', 'rank']]
+    merged = previous.merge(current, on='stock_code', how='outer', suffixes=('_old', '_new'), indicator=True)
+    old_rank = pd.to_numeric(merged['rank_old'], errors='coerce')
+    new_rank = pd.to_numeric(merged['rank_new'], errors='coerce')
+    diff = pd.DataFrame({
+        'stock_code': merged['stock_code'],
+        'short_name': merged['short_name_new'].fillna(merged['short_name_old']),
+        'change': np.select(
+            [merged['_merge'] == 'right_only', merged['_merge'] == 'left_only', new_rank < old_rank],
+            [CHANGE_ENTRY, CHANGE_EXIT, CHANGE_UP], default=CHANGE_DOWN
+        ),
+        'old_rank': old_rank.astype('Int64'),
+        'new_rank': new_rank.astype('Int64'),
+        'rank_delta': (old_rank - new_rank).astype('Int64')
+    })
+    diff = diff[(merged['_merge'] != 'both').to_numpy() | (old_rank != new_rank).to_numpy()]
+    # 按新排名排列，跌出榜单的放在最后
+    return diff.sort_values(['new_rank', 'old_rank'], na_position='last', ignore_index=True)
+
+
+class HotListRefresher:
+    """共享的热榜刷新器：后台线程定时获取热榜并计算变化
+
+    on_delta(kind, data, info)在刷新线程中调用：第一次取到热榜时kind为'baseline'、data为整张热榜，
+    之后只在有变化时以kind='delta'、data为变化行调用
+    """
+
+    def __init__(self, interval=HOT_REFRESH_INTERVAL, fetch=None, on_delta=None, idle_timeout=HOT_IDLE_TIMEOUT):
+        self.interval = max(HOT_MIN_INTERVAL, interval)
+        self.fetch = fetch or (lambda: get_fetcher().fetch('hot_rank_ths'))
+        self.on_delta = on_delta
+        self.idle_timeout = idle_timeout
+        self.snapshot = None         # 最新热榜
+        self.version = 0             # 快照版本，每次刷新后递增
+        self.updated_at = None
+        self.last_diff = pd.DataFrame(columns=DIFF_COLUMNS)
+        self.recent_changes = deque(maxlen=HOT_RECENT_CHANGES)  # [(时间, 变化行)]
+        self.error = None
+        self.concepts = ConceptCounter()  # 只在刷新线程中更新
+        self.concept_counts = None        # 最新热榜的概念统计
+        self.last_seen = time.monotonic()
+        self.last_refresh = time.monotonic()  # 刷新线程上一次刷新（或暂停中检查）的时间
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台线程（已启动时不重复启动）"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="hot-refresher", daemon=True)
+                self._thread.start()
+
+    def set_interval(self, interval):
+        """修改刷新间隔：距上次刷新已超过新间隔时立即刷新，否则到距上次刷新满新间隔时刷新"""
+        self.interval = max(HOT_MIN_INTERVAL, interval)
+        if time.monotonic() - self.last_refresh >= self.interval:
+            self._wake.set()
+
+    def touch(self):
+        """会话查看实时热榜时调用；暂停中的刷新器会立即刷新一次"""
+        idle = self.is_idle()
+        self.last_seen = time.monotonic()
+        if idle:
+            self._wake.set()
+
+    def is_idle(self):
+        return time.monotonic() - self.last_seen > self.idle_timeout
+
+    def _loop(self):
+        while True:
+            self.last_refresh = time.monotonic()
+            if not self.is_idle():
+                self.refresh_once()
+            self._wait()
+
+    def _wait(self):
+        """等到距上次刷新满一个间隔；等待中修改的间隔按新值计算，被唤醒时立即返回"""
+        while True:
+            remaining = self.last_refresh + self.interval - time.monotonic()
+            if remaining <= 0 or self._wake.wait(min(remaining, HOT_MIN_INTERVAL)):
+                self._wake.clear()
+                return
+
+    def refresh_once(self):
+        """获取一次热榜并更新快照，返回本次的变化"""
+        try:
+            with span('hot_refresher.refresh'):
+                current = self.fetch()
+                if current is None or current.empty:
+                    raise ValueError("热榜数据为空")
+                current = _ranked(current)
+                current = current[[column for column in HOT_COLUMNS if column in current.columns]].reset_index(drop=True)
+                diff = diff_hot_lists(self.snapshot, current)
+                # 增量统计概念，只重新拆分变化的行
+                self.concepts.update(current)
+                concept_counts = self.concepts.to_frame()
+        except Exception as e:
+            self.error = f"{datetime.now().strftime('%H:%M:%S')} 刷新失败: {e}"
+            print(f"热榜刷新失败: {e}")
+            return None
+
+        baseline = self.snapshot is None
+        now = datetime.now()
+        with self._lock:
+            self.snapshot = current
+            self.version += 1
+            self.updated_at = now
+            self.last_diff = diff
+            self.concept_counts = concept_counts
+            self.error = None
+            if not diff.empty:
+                self.recent_changes.append((now, diff))
+            version = self.version
+
+        if self.on_delta is not None and (baseline or not diff.empty):
+            info = {
+                'version': version,
+                'entries': int((diff['change'] == CHANGE_ENTRY).sum()),
+                'exits': int((diff['change'] == CHANGE_EXIT).sum()),
+                'moves': int(diff['change'].isin([CHANGE_UP, CHANGE_DOWN]).sum())
+            }
+            try:
+                if baseline:
+                    self.on_delta('baseline', current, info)
+                else:
+                    self.on_delta('delta', diff, info)
+            except Exception as e:
+                print(f"保存热榜变化失败: {e}")
+        return diff
+
+    def state(self):
+        """当前快照和变化的一致视图：(版本, 快照, 更新时间, 最近一次变化, 错误信息)"""
+        with self._lock:
+            return self.version, self.snapshot, self.updated_at, self.last_diff, self.error
+
+    def changes_since(self, since):
+        """某个时间之后的全部变化（合并为一张表，最新的在前）"""
+        with self._lock:
+            frames = [diff.assign(time=at.strftime('%H:%M:%S')) for at, diff in self.recent_changes if at > since]
+        if not frames:
+            return pd.DataFrame(columns=['time'] + DIFF_COLUMNS)
+        changes = pd.concat(frames[::-1], ignore_index=True)
+        return changes[['time'] + DIFF_COLUMNS]
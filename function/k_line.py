@@ -1,9 +1,26 @@
 # k线图函数
+import io
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection
+from perf import timed
 
 
+def build_colored_segments(times, prices, changes):
+    """一次性构建涨跌着色线段，返回(线段数组, 颜色列表)"""
+    x = mdates.date2num(times)
+    y = np.asarray(prices, dtype=float)
+    changes = np.asarray(changes, dtype=float)
+    points = np.column_stack([x, y])
+    segments = np.stack([points[:-1], points[1:]], axis=1)
+    # 第i段的颜色由第i+1个点的涨跌决定，与逐段绘制的逻辑一致
+    colors = np.where(changes[1:] > 0, 'red', np.where(changes[1:] < 0, 'green', 'gray'))
+    return segments, colors.tolist()
+
+
+@timed('kline.draw')
 def draw_kline(df, stock_code):
     """绘制K线图，返回matplotlib图形对象"""
     # 数据预处理
@@ -20,18 +37,14 @@ def draw_kline(df, stock_code):
     ax.plot(df['trade_time'], df['price'], linewidth=2, color='#1f77b4', 
             marker='o', markersize=3, markerfacecolor='white', markeredgewidth=1.5)
     
-    # 根据涨跌给线条着色
-    for i in range(1, len(df)):
-        if df.iloc[i]['change'] > 0:
-            color = 'red'
-        elif df.iloc[i]['change'] < 0:
-            color = 'green'
-        else:
-            color = 'gray'
-        
-        ax.plot([df.iloc[i-1]['trade_time'], df.iloc[i]['trade_time']], 
-                [df.iloc[i-1]['price'], df.iloc[i]['price']], 
-                color=color, linewidth=2, alpha=0.8)
+    # 根据涨跌给线条着色（单个LineCollection替代逐段ax.plot）
+    times = df['trade_time'].to_numpy()
+    prices = df['price'].to_numpy()
+    if len(df) > 1:
+        segments, colors = build_colored_segments(times, prices, df['change'].to_numpy())
+        ax.add_collection(LineCollection(segments, colors=colors, linewidths=2, alpha=0.8,
+                                         capstyle='projecting', joinstyle='round'),
+                          autolim=False)
     
     # 找出最高点和最低点
     max_idx = df['price'].idxmax()
@@ -63,8 +76,8 @@ def draw_kline(df, stock_code):
     step = max(1, len(df) // 8)
     for i in range(0, len(df), step):
         if i != max_idx and i != min_idx:  # 避免与最高最低点标注重叠
-            ax.annotate(f'{df.iloc[i]["price"]:.2f}', 
-                        xy=(df.iloc[i]['trade_time'], df.iloc[i]['price']),
+            ax.annotate(f'{prices[i]:.2f}', 
+                        xy=(times[i], prices[i]),
                         xytext=(5, 10), textcoords='offset points', 
                         fontsize=9, alpha=0.6)
     
@@ -92,9 +105,10 @@ def draw_kline(df, stock_code):
     plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
     
     # 添加当前价格和涨跌信息到图例
-    current_price = df.iloc[-1]['price']
-    current_change = df.iloc[-1]['change']
-    current_change_pct = df.iloc[-1]['change_pct']
+    last_row = df.iloc[-1]
+    current_price = last_row['price']
+    current_change = last_row['change']
+    current_change_pct = last_row['change_pct']
     
     legend_text = f'Current: {current_price:.2f}\nChange: {current_change:+.2f} ({current_change_pct:+.2f}%)\nHigh: {max_price:.2f}\nLow: {min_price:.2f}'
     ax.text(0.02, 0.98, legend_text, transform=ax.transAxes, fontsize=11,
@@ -106,4 +120,12 @@ def draw_kline(df, stock_code):
     # 进一步调整子图参数以减少空白
     plt.subplots_adjust(bottom=0.15, top=0.95, left=0.08, right=0.95)
     
-    return fig
\ No newline at end of file
+    return fig
+
+
+@timed('kline.encode')
+def encode_figure(fig, dpi=100, fmt='png'):
+    """将图形编码为内存中的图片字节"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
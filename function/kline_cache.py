@@ -0,0 +1,213 @@
+# K线图渲染缓存
+# 以(股票代码, 分钟线数据哈希, 渲染参数)为键，把编码后的图片字节存到磁盘，数据不变时跳过matplotlib
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import pandas as pd
+from k_line import draw_kline, encode_figure
+from perf import timed
+
+CACHE_DIR = os.path.join('image', 'cache')
+INDEX_FILENAME = 'index.json'
+MAX_CACHE_BYTES = 256 * 1024 * 1024  # 缓存总大小上限
+MAX_CACHE_ENTRIES = 1000  # 缓存条目上限
+RENDER_VERSION = 1  # 修改draw_kline的绘制效果后递增，使旧缓存失效
+HASH_COLUMNS = ['trade_time', 'price', 'change', 'change_pct']
+IMAGE_EXTENSIONS = ('.png', '.webp', '.jpg', '.jpeg', '.svg')  # 归档图片可能的格式
+
+
+def hash_kline_data(df):
+    """计算分钟线数据的内容哈希"""
+    digest = hashlib.sha1()
+    digest.update(str(len(df)).encode())
+    for column in HASH_COLUMNS:
+        if column not in df.columns:
+            continue
+        if column == 'trade_time':
+            values = pd.to_datetime(df[column]).to_numpy(dtype='datetime64[ns]').view('int64')
+        else:
+            values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype='float64')
+        digest.update(column.encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def make_cache_key(stock_code, data_hash, dpi, fmt):
+    """生成缓存键"""
+    raw = f"{stock_code}|{data_hash}|dpi={dpi}|fmt={fmt}|v={RENDER_VERSION}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class KlineImageCache:
+    """基于内容哈希的K线图磁盘缓存，按LRU淘汰，同时维护每只股票最新归档图片的索引"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_CACHE_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.index_file = os.path.join(cache_dir, INDEX_FILENAME)
+        self.entries = OrderedDict()  # key -> {"file", "size", "stock_code"}，越靠后越新
+        self.latest = {}  # stock_code -> {"file", "key"}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """加载索引，首次使用时扫描image目录建立最新图片索引"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                for key, entry in index.get('entries', []):
+                    if os.path.exists(os.path.join(self.cache_dir, entry['file'])):
+                        self.entries[key] = entry
+                        self.total_bytes += entry['size']
+                self.latest = index.get('latest', {})
+                self._evict()
+                return
+        except Exception as e:
+            print(f"加载K线图缓存索引失败: {e}")
+            self.entries.clear()
+            self.total_bytes = 0
+        self.latest = self._scan_latest_images(os.path.dirname(self.cache_dir) or '.')
+        self._save_index()
+
+    @staticmethod
+    def _scan_latest_images(image_dir):
+        """扫描旧的{stock_code}_{timestamp}.{格式}图片，取每只股票最新的一张"""
+        latest = {}
+        newest = {}
+        for filename in os.listdir(image_dir):
+            name, ext = os.path.splitext(filename)
+            parts = name.split('_')
+            if ext not in IMAGE_EXTENSIONS or len(parts) != 2 or not parts[1].isdigit():
+                continue
+            stock_code, timestamp = parts[0], int(parts[1])
+            if timestamp > newest.get(stock_code, -1):
+                newest[stock_code] = timestamp
+                latest[stock_code] = {"file": os.path.join(image_dir, filename), "key": None}
+        return latest
+
+    def _save_index(self):
+        """原子写入索引文件"""
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'entries': list(self.entries.items()), 'latest': self.latest}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+
+    def get(self, key):
+        """读取缓存的图片字节，未命中返回None"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(os.path.join(self.cache_dir, entry['file']), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                self.entries.pop(key, None)
+                self.total_bytes -= entry['size']
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, stock_code, data, fmt='png'):
+        """写入图片字节并按容量淘汰最久未使用的条目"""
+        with self._lock:
+            filename = f"{key}.{fmt}"
+            with open(os.path.join(self.cache_dir, filename), 'wb') as f:
+                f.write(data)
+            old_entry = self.entries.pop(key, None)
+            if old_entry:
+                self.total_bytes -= old_entry['size']
+            self.entries[key] = {"file": filename, "size": len(data), "stock_code": stock_code}
+            self.total_bytes += len(data)
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        """淘汰超出容量的条目"""
+        while self.entries and (self.total_bytes > self.max_bytes or len(self.entries) > self.max_entries):
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry['size']
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except OSError:
+                pass
+
+    def record_latest(self, stock_code, filename, key):
+        """记录股票最新的归档图片"""
+        with self._lock:
+            self.latest[stock_code] = {"file": filename, "key": key}
+            self._save_index()
+
+    def latest_entry(self, stock_code):
+        """获取股票最新归档图片的索引项"""
+        return self.latest.get(stock_code)
+
+    def latest_image(self, stock_code):
+        """获取股票最新归档图片路径"""
+        entry = self.latest.get(stock_code)
+        if entry and os.path.exists(entry['file']):
+            return entry['file']
+        return None
+
+    def stats(self):
+        """缓存统计信息"""
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+_kline_cache = None
+_kline_cache_lock = threading.Lock()
+
+
+def get_kline_cache():
+    """获取进程内共享的K线图缓存"""
+    global _kline_cache
+    if _kline_cache is None:
+        with _kline_cache_lock:
+            if _kline_cache is None:
+                _kline_cache = KlineImageCache()
+    return _kline_cache
+
+
+@timed('kline.render_cached')
+def render_kline_cached(df, stock_code, specs, cache=None):
+    """按(dpi, fmt)获取K线图，返回{(dpi, fmt): (缓存键, 图片字节)}；全部命中时不调用matplotlib"""
+    cache = cache or get_kline_cache()
+    data_hash = hash_kline_data(df)
+    results = {}
+    missing = []
+    for dpi, fmt in dict.fromkeys(specs):
+        key = make_cache_key(stock_code, data_hash, dpi, fmt)
+        data = cache.get(key)
+        if data is None:
+            missing.append((dpi, fmt, key))
+        else:
+            results[(dpi, fmt)] = (key, data)
+
+    if missing:
+        fig = draw_kline(df, stock_code)
+        try:
+            for dpi, fmt, key in missing:
+                data = encode_figure(fig, dpi, fmt)
+                cache.put(key, stock_code, data, fmt)
+                results[(dpi, fmt)] = (key, data)
+        finally:
+            plt.close(fig)
+    return results
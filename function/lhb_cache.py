@@ -0,0 +1,141 @@
+# 龙虎榜每日列表缓存
+# 按报告日期缓存，进程内所有会话共享；同一日期的并发请求只下载一次；已发布的列表落盘为Parquet，重启后直接读取
+import os
+import threading
+import time
+import pandas as pd
+from data_fetch import get_fetcher
+
+LHB_CACHE_DIR = 'lhb_cache'
+MAX_MEMORY_DATES = 10   # 内存中最多保留的日期数
+EMPTY_LIST_TTL = 300    # 空列表（当日数据未发布）的缓存秒数，过期后重新下载
+
+
+class LhbDailyList:
+    """某一日的龙虎榜列表，按股票代码和股票名称建立索引"""
+
+    def __init__(self, report_date, data):
+        self.report_date = report_date
+        self.data = data.reset_index(drop=True) if data is not None else pd.DataFrame()
+        self.fetched_at = time.time()
+        self.code_to_rows = {}
+        self.name_to_code = {}
+        if not self.data.empty and 'stock_code' in self.data.columns:
+            for row, code in enumerate(self.data['stock_code'].astype(str).tolist()):
+                self.code_to_rows.setdefault(code, []).append(row)
+            if 'short_name' in self.data.columns:
+                for code, name in zip(self.data['stock_code'].astype(str).tolist(), self.data['short_name'].tolist()):
+                    self.name_to_code.setdefault(name, code)
+
+    @property
+    def empty(self):
+        return self.data.empty
+
+    def resolve_code(self, code_or_name):
+        """把股票代码或名称解析为榜单中的股票代码，不在榜单中返回None"""
+        if code_or_name in self.code_to_rows:
+            return code_or_name
+        return self.name_to_code.get(code_or_name)
+
+    def rows_for(self, code_or_name):
+        """取出某只股票在榜单中的所有记录，不在榜单中返回None"""
+        code = self.resolve_code(code_or_name)
+        if code is None:
+            return None
+        return self.data.iloc[self.code_to_rows[code]]
+
+
+class LhbDailyCache:
+    """按报告日期缓存龙虎榜每日列表"""
+
+    def __init__(self, fetch=None, cache_dir=LHB_CACHE_DIR, max_dates=MAX_MEMORY_DATES):
+        self.fetch = fetch or (lambda report_date: get_fetcher().fetch('lhb_daily', report_date))
+        self.cache_dir = cache_dir
+        self.max_dates = max_dates
+        self.lists = {}      # report_date -> LhbDailyList
+        self.inflight = {}   # report_date -> threading.Event，正在下载的日期
+        self.fetch_count = 0
+        self._lock = threading.Lock()
+
+    def _parquet_path(self, report_date):
+        return os.path.join(self.cache_dir, f"lhb_{report_date}.parquet")
+
+    def _is_fresh(self, daily):
+        return not daily.empty or time.time() - daily.fetched_at < EMPTY_LIST_TTL
+
+    def peek(self, report_date):
+        """只查内存缓存，不下载；没有可用的缓存返回None"""
+        with self._lock:
+            daily = self.lists.get(str(report_date))
+            return daily if daily is not None and self._is_fresh(daily) else None
+
+    def get(self, report_date):
+        """获取某一日的龙虎榜列表"""
+        report_date = str(report_date)
+        while True:
+            with self._lock:
+                daily = self.lists.get(report_date)
+                if daily is not None and self._is_fresh(daily):
+                    return daily
+                event = self.inflight.get(report_date)
+                if event is None:
+                    # 当前线程负责下载，其他线程等待结果
+                    event = threading.Event()
+                    self.inflight[report_date] = event
+                    break
+            event.wait()
+
+        try:
+            daily = LhbDailyList(report_date, self._load(report_date))
+            with self._lock:
+                self.lists[report_date] = daily
+                while len(self.lists) > self.max_dates:
+                    self.lists.pop(min(self.lists))
+            return daily
+        finally:
+            with self._lock:
+                self.inflight.pop(report_date, None)
+            event.set()
+
+    def _load(self, report_date):
+        """先读磁盘，没有再下载；非空列表下载后落盘"""
+        path = self._parquet_path(report_date)
+        if os.path.exists(path):
+            try:
+                return pd.read_parquet(path)
+            except Exception as e:
+                print(f"读取龙虎榜缓存失败: {e}")
+        self.fetch_count += 1
+        data = self.fetch(report_date)
+        if data is not None and not data.empty:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = path + '.tmp'
+                data.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                # 未安装pyarrow等情况下只使用内存缓存
+                print(f"保存龙虎榜缓存失败: {e}")
+        return data
+
+    def invalidate(self, report_date=None):
+        """清除内存缓存（report_date为None时清除全部）"""
+        with self._lock:
+            if report_date is None:
+                self.lists.clear()
+            else:
+                self.lists.pop(str(report_date), None)
+
+
+_lhb_cache = None
+_lhb_cache_lock = threading.Lock()
+
+
+def get_lhb_cache():
+    """获取进程内共享的龙虎榜列表缓存"""
+    global _lhb_cache
+    if _lhb_cache is None:
+        with _lhb_cache_lock:
+            if _lhb_cache is None:
+                _lhb_cache = LhbDailyCache()
+    return _lhb_cache
@@ -0,0 +1,173 @@
+# 性能计时
+# span()/timed()记录热点路径的耗时：按名称保留最近的耗时用于计算p50/p95，同时归入当前请求（一次页面运行）
+# 设置环境变量LHB_PERF_LOG=文件路径后，每条计时以JSON行追加写入该文件，便于离线分析
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+PERF_LOG_ENV = 'LHB_PERF_LOG'
+ROLLING_WINDOW = 500  # 每个名称保留最近多少次耗时
+MAX_REQUESTS = 50     # 保留最近多少个请求的明细
+
+_current_request = contextvars.ContextVar('perf_request', default=None)
+
+
+class PerfRequest:
+    """一次请求（页面运行）内的所有计时"""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.started_at = datetime.now()
+        self.elapsed = None
+        self.spans = []  # [(名称, 秒)]，线程池中的计时也会加入
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.spans.append((name, seconds))
+
+    def summary(self):
+        """按名称汇总：次数、总耗时，按总耗时倒序"""
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return pd.DataFrame(columns=['name', 'count', 'total_ms'])
+        df = pd.DataFrame(spans, columns=['name', 'seconds'])
+        summary = df.groupby('name')['seconds'].agg(['count', 'sum']).reset_index()
+        summary['total_ms'] = summary.pop('sum') * 1000
+        return summary.sort_values('total_ms', ascending=False, ignore_index=True)
+
+
+class PerfRecorder:
+    """进程内的计时汇总"""
+
+    def __init__(self, log_path=None):
+        self.durations = {}  # 名称 -> deque(秒)
+        self.requests = deque(maxlen=MAX_REQUESTS)
+        self.log_path = log_path
+        self._log_file = None
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, request=None):
+        with self._lock:
+            if name not in self.durations:
+                self.durations[name] = deque(maxlen=ROLLING_WINDOW)
+            self.durations[name].append(seconds)
+            if self.log_path:
+                self._write_log({
+                    'ts': datetime.now().isoformat(),
+                    'name': name,
+                    'ms': round(seconds * 1000, 3),
+                    'request': request.name if request else None,
+                    'request_id': request.id if request else None,
+                    'thread': threading.current_thread().name
+                })
+        if request is not None:
+            request.add(name, seconds)
+
+    def _write_log(self, record):
+        try:
+            if self._log_file is None:
+                os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+                self._log_file = open(self.log_path, 'a', encoding='utf-8')
+            self._log_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._log_file.flush()
+        except OSError as e:
+            print(f"写入性能日志失败: {e}")
+            self.log_path = None
+
+    def stats(self):
+        """各名称最近耗时的统计（毫秒），按总耗时倒序"""
+        with self._lock:
+            items = [(name, np.array(values)) for name, values in self.durations.items() if values]
+        rows = [{
+            'name': name,
+            'count': len(values),
+            'p50_ms': np.percentile(values, 50) * 1000,
+            'p95_ms': np.percentile(values, 95) * 1000,
+            'max_ms': values.max() * 1000,
+            'total_ms': values.sum() * 1000
+        } for name, values in items]
+        columns = ['name', 'count', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms']
+        return pd.DataFrame(rows, columns=columns).sort_values('total_ms', ascending=False, ignore_index=True)
+
+    def recent_requests(self, n=10):
+        """最近n个请求（新的在前）"""
+        with self._lock:
+            return list(self.requests)[-n:][::-1]
+
+    def finish_request(self, request):
+        with self._lock:
+            self.requests.append(request)
+
+    def clear(self):
+        with self._lock:
+            self.durations.clear()
+            self.requests.clear()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_perf_recorder():
+    """获取进程内共享的计时汇总"""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = PerfRecorder(os.environ.get(PERF_LOG_ENV) or None)
+    return _recorder
+
+
+@contextmanager
+def span(name):
+    """计时一段代码"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_perf_recorder().record(name, time.perf_counter() - start, _current_request.get())
+
+
+def timed(name=None):
+    """计时装饰器，name缺省为 模块名.函数名"""
+    def decorator(func):
+        span_name = name or f"{func.__module__.split('.')[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def request_scope(name):
+    """把其中的所有计时归入一个请求，结束后加入最近请求列表"""
+    request = PerfRequest(name)
+    token = _current_request.set(request)
+    start = time.perf_counter()
+    try:
+        yield request
+    finally:
+        request.elapsed = time.perf_counter() - start
+        _current_request.reset(token)
+        get_perf_recorder().finish_request(request)
+
+
+def current_request():
+    """当前请求，不在request_scope内时为None"""
+    return _current_request.get()
+
@@ -0,0 +1,108 @@
+# 批量行情
+# 把股票代码列表按批拆分后并发请求实时行情（list_market_current），一次请求全部代码容易超时，且一处失败就全部丢失
+# 每批在调用层内按退避重试；仍然失败的批次拆成两半重新请求，把问题缩小到个别代码，其余代码的行情照常返回
+import math
+import time
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, wait
+from data_fetch import get_fetcher
+from perf import timed
+
+QUOTE_MIN_BATCH = 20      # 每批最少的股票数
+QUOTE_MAX_BATCH = 200     # 每批最多的股票数
+QUOTE_PARALLEL = 8        # 希望同时进行的批数
+QUOTE_SPLIT_DEPTH = 2     # 失败批次最多拆分几次
+
+
+def batch_size_for(n, parallel=QUOTE_PARALLEL):
+    """按代码数量选择每批大小：数量少时拆成多批并发，数量多时加大批次，减少受限速约束的请求数"""
+    return min(QUOTE_MAX_BATCH, max(QUOTE_MIN_BATCH, math.ceil(n / parallel)))
+
+
+def iter_quotes(codes, batch_size=None, deadline=None, split_depth=QUOTE_SPLIT_DEPTH):
+    """分批并发请求行情，按完成顺序逐批返回(该批代码, 行情, 错误信息)
+
+    deadline为time.monotonic()时间，到时仍未返回的批次以超时错误返回；失败的批次拆成两半重试，
+    只有拆到不能再拆（或超出拆分次数、已无剩余时间）时才返回错误
+    """
+    codes = list(dict.fromkeys(str(code) for code in codes))
+    if not codes:
+        return
+    batch_size = batch_size or batch_size_for(len(codes))
+    fetcher = get_fetcher()
+    pending = {}
+
+    def submit(chunk, depth):
+        future = fetcher.submit('market_current', code_list=chunk)
+        if deadline is not None:
+            future.deadline = min(future.deadline, deadline)
+        pending[future] = (chunk, depth)
+
+    for i in range(0, len(codes), batch_size):
+        submit(codes[i:i + batch_size], 0)
+
+    while pending:
+        timeout = max(0.0, min(future.deadline for future in pending) - time.monotonic())
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        if not done:
+            # 到期的批次不再等待（线程无法中断，结果在后台结束后丢弃）
+            done = {future for future in pending if future.deadline <= now}
+        for future in done:
+            chunk, depth = pending.pop(future)
+            if not future.done():
+                future.cancel()
+                yield chunk, None, "请求超时"
+                continue
+            try:
+                frame = future.result()
+            except Exception as e:
+                if len(chunk) > 1 and depth < split_depth and future.deadline > now:
+                    middle = len(chunk) // 2
+                    submit(chunk[:middle], depth + 1)
+                    submit(chunk[middle:], depth + 1)
+                else:
+                    yield chunk, None, str(e)
+                continue
+            yield chunk, frame, None
+
+
+class QuoteFetchResult:
+    """批量行情的结果"""
+
+    def __init__(self, quotes, failed_codes, errors):
+        self.quotes = quotes              # 合并后的行情，按输入代码的顺序排列
+        self.failed_codes = failed_codes  # 没有取到行情的代码
+        self.errors = errors              # 失败批次的错误信息
+
+    @property
+    def partial(self):
+        return bool(self.failed_codes)
+
+
+@timed('quotes.fetch')
+def fetch_quotes(codes, batch_size=None, deadline=None, columns=None):
+    """批量请求行情并合并，部分批次失败时返回其余代码的行情；columns为需要保留的列"""
+    codes = list(dict.fromkeys(str(code) for code in codes))
+    order = {code: i for i, code in enumerate(codes)}
+    frames = []
+    failed_codes = []
+    errors = []
+    for chunk, frame, error in iter_quotes(codes, batch_size, deadline):
+        if error is not None:
+            failed_codes.extend(chunk)
+            errors.append(f"{len(chunk)}只股票: {error}")
+            print(f"行情批次请求失败（{len(chunk)}只股票）: {error}")
+        elif frame is not None and not frame.empty:
+            frames.append(frame)
+
+    if frames:
+        quotes = pd.concat(frames, ignore_index=True).drop_duplicates('stock_code')
+        # 按输入顺序排列，结果与批次完成的先后无关
+        quotes = quotes.iloc[quotes['stock_code'].map(order).fillna(len(codes)).to_numpy().argsort(kind='stable')]
+        quotes = quotes.reset_index(drop=True)
+    else:
+        quotes = pd.DataFrame(columns=['stock_code'])
+    if columns is not None:
+        quotes = quotes.reindex(columns=columns)
+    return QuoteFetchResult(quotes, sorted(failed_codes, key=order.get), errors)
@@ -0,0 +1,81 @@
+# 数值列区间筛选索引
+# 数据载入时对每个数值列排序一次（保存排序后的值和对应行号），区间条件用searchsorted定位，多个条件取交集
+# 筛选结果按(数据版本, 条件)缓存，页面上调整阈值后再次出现的组合直接返回
+import itertools
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from perf import timed
+
+FILTER_CACHE_SIZE = 32  # 每份数据缓存的筛选结果个数
+
+_versions = itertools.count(1)
+
+
+class SortedColumnIndex:
+    """DataFrame数值列的排序索引，filter()按区间条件返回子表（保持原来的行顺序）
+
+    data变化后需要重新创建索引，version用于区分不同的数据
+    """
+
+    def __init__(self, data, columns):
+        self.data = data
+        self.version = next(_versions)
+        self.sorted_values = {}  # 列名 -> 排序后的值（不含NaN）
+        self.sorted_rows = {}    # 列名 -> 排序后的值对应的行号
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        for column in columns:
+            if column not in data.columns:
+                continue
+            values = data[column].to_numpy()
+            if values.dtype.kind != 'f':
+                # 整数列按float64比较，避免小数阈值被截断；未转换类型的列在这里转换一次
+                values = pd.to_numeric(data[column], errors='coerce').to_numpy(dtype='float64')
+            rows = np.flatnonzero(~np.isnan(values))
+            order = rows[np.argsort(values[rows], kind='stable')]
+            self.sorted_values[column] = values[order]
+            self.sorted_rows[column] = order
+
+    def positions(self, column, low=None, high=None):
+        """low <= 值 <= high 的行号（按值排序），None表示不限"""
+        values = self.sorted_values[column]
+        # 阈值转换为列的类型后比较，与直接比较列得到的结果一致
+        start = 0 if low is None else np.searchsorted(values, values.dtype.type(low), side='left')
+        end = len(values) if high is None else np.searchsorted(values, values.dtype.type(high), side='right')
+        return self.sorted_rows[column][start:end]
+
+    def _filter_rows(self, ranges):
+        candidates = [self.positions(column, low, high) for column, (low, high) in ranges]
+        if not candidates:
+            return None
+        # 从最小的候选集开始，逐个用布尔表求交集
+        candidates.sort(key=len)
+        rows = candidates[0]
+        for other in candidates[1:]:
+            member = np.zeros(len(self.data), dtype=bool)
+            member[other] = True
+            rows = rows[member[rows]]
+        return np.sort(rows)
+
+    @timed('range_index.filter')
+    def filter(self, **ranges):
+        """按区间筛选，例如 filter(price=(None, 20), volume=(1e6, None))；没有索引的列忽略"""
+        ranges = tuple(sorted((column, tuple(bounds)) for column, bounds in ranges.items()
+                              if column in self.sorted_values))
+        key = (self.version, ranges)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        rows = self._filter_rows(ranges)
+        if rows is None or len(rows) == len(self.data):
+            result = self.data
+        else:
+            result = self.data.iloc[rows]
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > FILTER_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
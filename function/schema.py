@@ -0,0 +1,57 @@
+# 数据列类型
+# adata返回的数值列常常是字符串或object，在调用层取到数据时按接口统一转换一次：
+# 价格、涨跌幅用float32，成交量用int64，标签用category；之后的筛选直接在类型化的列上做比较，不再逐次to_numeric
+import numpy as np
+import pandas as pd
+
+# 接口名称 -> {列名: 类型}，只转换结果中存在的列，接口名称与data_source.ADATA_ENDPOINTS一致
+SCHEMAS = {
+    'hot_rank_ths': {
+        'rank': 'int64',
+        'stock_code': 'str',
+        'change_pct': 'float32',
+        'hot_value': 'float64',
+        'pop_tag': 'category',
+        'concept_tag': 'category'
+    },
+    'market_current': {
+        'stock_code': 'str',
+        'price': 'float32',
+        'change': 'float32',
+        'change_pct': 'float32',
+        'volume': 'int64',
+        'amount': 'float64'
+    }
+}
+
+
+def coerce_column(series, dtype):
+    """把一列转换为指定类型；无法解析的数值为NaN，含NaN或小数的整数列退为float64"""
+    if dtype == 'category':
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    if dtype == 'str':
+        return series.astype('str').where(series.notna())
+    if series.dtype == dtype:
+        return series
+    values = pd.to_numeric(series, errors='coerce')
+    if dtype == 'int64':
+        array = values.to_numpy(dtype='float64')
+        if np.isnan(array).any() or (array != np.round(array)).any():
+            return values.astype('float64')
+    return values.astype(dtype)
+
+
+def coerce_frame(df, schema):
+    """按schema转换DataFrame中的列（原地替换列，不复制其他列）"""
+    for column, dtype in schema.items():
+        if column in df.columns:
+            df[column] = coerce_column(df[column], dtype)
+    return df
+
+
+def normalize(endpoint, result):
+    """接口结果的类型转换：没有schema的接口或非DataFrame结果原样返回"""
+    schema = SCHEMAS.get(endpoint)
+    if schema is None or not isinstance(result, pd.DataFrame):
+        return result
+    return coerce_frame(result, schema)
@@ -0,0 +1,232 @@
+# 全市场选股
+# 从代码表取全部股票，通过quote_fetch分批并发请求实时行情（list_market_current），在全市场约5000行上向量化计算筛选表达式，按指定列排序返回前N只
+# 整个过程受时间预算限制：预算内没有取到行情的股票跳过，结果中给出覆盖率；通过筛选的股票再查询所属概念，复用concept_count统计
+import ast
+import operator
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from data_fetch import get_fetcher
+from quote_fetch import fetch_quotes
+from symbol_index import get_symbol_index
+from ths_hot import concept_count
+from perf import span, timed
+
+SCREEN_BUDGET = 15.0      # 一次选股的时间预算（秒）
+SCREEN_LIMIT = 50         # 返回的股票数
+CONCEPT_TOP = 30          # 只为排名靠前的多少只股票查询概念
+# 与原热榜筛选条件相同：上涨、非创业板、价格不高于20元
+DEFAULT_EXPRESSION = "change_pct > 0 and not stock_code.startswith('300') and price <= 20"
+DEFAULT_SORT = 'change_pct'
+# 表达式中可以使用的行情列
+QUOTE_COLUMNS = ['stock_code', 'short_name', 'price', 'change', 'change_pct', 'volume', 'amount']
+# 文本列只能比较和调用字符串方法，不能参与四则运算（'x' * 999999999 这类运算会占满内存）
+TEXT_COLUMNS = ['stock_code', 'short_name']
+
+
+class ScreenExpressionError(ValueError):
+    """筛选表达式不合法"""
+
+
+_COMPARE_OPS = {
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+    ast.Eq: operator.eq, ast.NotEq: operator.ne
+}
+_BIN_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+_STRING_METHODS = {'startswith', 'endswith', 'contains'}
+
+
+def compile_expression(expression, columns=QUOTE_COLUMNS):
+    """解析并检查筛选表达式，只允许列名、常量、比较、and/or/not、四则运算、in和字符串方法
+
+    例如: change_pct > 3 and price < 20 and not stock_code.startswith(('300', '688'))
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ScreenExpressionError(f"表达式语法错误: {e.msg}")
+    methods = set()  # 字符串方法调用中的属性节点，其他位置不允许访问属性
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            if id(node) not in methods:
+                raise ScreenExpressionError(f"不支持访问属性: {node.attr}")
+        elif isinstance(node, ast.Name):
+            if node.id not in columns:
+                raise ScreenExpressionError(f"未知的列: {node.id}（可用: {', '.join(columns)}）")
+        elif isinstance(node, ast.Call):
+            func = node.func
+            if (not isinstance(func, ast.Attribute) or func.attr not in _STRING_METHODS
+                    or not isinstance(func.value, ast.Name) or node.keywords or not node.args
+                    or not all(_is_text_literal(arg) for arg in node.args)):
+                raise ScreenExpressionError(f"只支持 列.{'/'.join(sorted(_STRING_METHODS))}('文本') 形式的调用")
+            methods.add(id(func))
+        elif isinstance(node, ast.BinOp):
+            for operand in (node.left, node.right):
+                if ((isinstance(operand, ast.Constant) and isinstance(operand.value, str))
+                        or (isinstance(operand, ast.Name) and operand.id in TEXT_COLUMNS)):
+                    raise ScreenExpressionError("文本不能参与四则运算")
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float, str)):
+                raise ScreenExpressionError(f"不支持的常量: {node.value!r}")
+        elif not isinstance(node, (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+                                   ast.Compare, ast.Load, ast.Tuple, ast.List,
+                                   ast.In, ast.NotIn, *_COMPARE_OPS, *_BIN_OPS)):
+            raise ScreenExpressionError(f"表达式中不支持: {type(node).__name__}")
+    return tree
+
+
+def _is_text_literal(node):
+    """字符串方法的参数：文本常量，或由文本常量组成的非空元组"""
+    elements = node.elts if isinstance(node, ast.Tuple) else [node]
+    return bool(elements) and all(isinstance(element, ast.Constant) and isinstance(element.value, str)
+                                  for element in elements)
+
+
+def _literal(node):
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return tuple(_literal(element) for element in node.elts)
+    raise ScreenExpressionError("此处只能使用常量")
+
+
+def _eval(node, df):
+    if isinstance(node, ast.Expression):
+        return _eval(node.body, df)
+    if isinstance(node, ast.Name):
+        return df[node.id]
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.BoolOp):
+        masks = [_as_mask(_eval(value, df), len(df)) for value in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return combine.reduce(masks)
+    if isinstance(node, ast.UnaryOp):
+        value = _eval(node.operand, df)
+        return ~_as_mask(value, len(df)) if isinstance(node.op, ast.Not) else -value
+    if isinstance(node, ast.BinOp):
+        return _BIN_OPS[type(node.op)](_eval(node.left, df), _eval(node.right, df))
+    if isinstance(node, ast.Compare):
+        # 链式比较 a < b < c 等价于 a < b and b < c
+        mask = np.ones(len(df), dtype=bool)
+        left = _eval(node.left, df)
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                values = _literal(comparator)
+                result = pd.Series(left).isin(values if isinstance(values, tuple) else (values,))
+                if isinstance(op, ast.NotIn):
+                    result = ~result
+                right = None
+            else:
+                right = _eval(comparator, df)
+                result = _COMPARE_OPS[type(op)](left, right)
+            mask &= _as_mask(result, len(df))
+            left = right
+        return mask
+    if isinstance(node, ast.Call):
+        series = df[node.func.value.id].astype('str')
+        # 多个参数或元组参数表示满足其中任意一个
+        patterns = []
+        for arg in node.args:
+            value = _literal(arg)
+            patterns.extend(value if isinstance(value, tuple) else (value,))
+        if node.func.attr == 'contains':
+            masks = [_as_mask(series.str.contains(pattern, regex=False), len(df)) for pattern in patterns]
+            return np.logical_or.reduce(masks)
+        return getattr(series.str, node.func.attr)(tuple(patterns))
+    raise ScreenExpressionError(f"表达式中不支持: {type(node).__name__}")
+
+
+def _as_mask(value, n):
+    """把比较结果转为布尔数组（缺失值视为不满足），常量广播到每一行"""
+    if isinstance(value, (pd.Series, np.ndarray)):
+        return pd.Series(value).fillna(False).to_numpy(dtype=bool)
+    return np.full(n, bool(value))
+
+
+@timed('screener.evaluate')
+def evaluate_expression(df, expression):
+    """在DataFrame上计算筛选表达式，返回布尔数组"""
+    tree = compile_expression(expression, list(df.columns)) if isinstance(expression, str) else expression
+    return _as_mask(_eval(tree, df), len(df))
+
+
+def fetch_concept_tags(codes, deadline=None):
+    """并发查询股票所属的同花顺概念，返回{股票代码: '概念1;概念2'}，超时或失败的股票跳过"""
+    fetcher = get_fetcher()
+    futures = {code: fetcher.submit('concept_ths', code) for code in codes}
+    tags = {}
+    for code, future in futures.items():
+        end = future.deadline if deadline is None else min(future.deadline, deadline)
+        try:
+            concepts = future.result(timeout=max(0.0, end - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            continue
+        except Exception as e:
+            print(f"{code}概念查询失败: {e}")
+            continue
+        if concepts is not None and not concepts.empty and 'name' in concepts.columns:
+            tags[code] = ';'.join(concepts['name'].dropna().astype(str))
+    return tags
+
+
+class ScreenResult:
+    """一次选股的结果"""
+
+    def __init__(self, stocks, concepts, universe, fetched, failed_codes, matched, elapsed):
+        self.stocks = stocks            # 排名后的股票（rank从1开始）
+        self.concepts = concepts        # 通过筛选的股票的概念统计（concept_count格式），未查询时为None
+        self.universe = universe        # 代码表中的股票数
+        self.fetched = fetched          # 取到行情的股票数
+        self.failed_codes = failed_codes  # 没有取到行情的股票代码
+        self.matched = matched          # 满足表达式的股票数（排名截取前）
+        self.elapsed = elapsed
+
+    @property
+    def coverage(self):
+        """取到行情的股票占全市场的比例"""
+        return self.fetched / self.universe if self.universe else 0.0
+
+    @property
+    def partial(self):
+        return bool(self.failed_codes)
+
+
+@timed('screener.run')
+def run_screen(expression=DEFAULT_EXPRESSION, sort_by=DEFAULT_SORT, ascending=False, limit=SCREEN_LIMIT,
+               budget=SCREEN_BUDGET, concept_top=CONCEPT_TOP, codes=None, batch_size=None):
+    """全市场选股：codes缺省为代码表中的全部股票；concept_top为0时不查询概念"""
+    start = time.monotonic()
+    deadline = start + budget
+    # 先检查表达式，不合法时不发请求
+    tree = compile_expression(expression)
+    if sort_by not in QUOTE_COLUMNS:
+        raise ScreenExpressionError(f"未知的排序列: {sort_by}")
+
+    if codes is None:
+        codes = get_symbol_index().codes.tolist()
+    with span('screener.snapshot'):
+        quotes = fetch_quotes(codes, batch_size, deadline)
+    snapshot = quotes.quotes
+    for column in QUOTE_COLUMNS:
+        if column not in snapshot.columns:
+            snapshot[column] = np.nan
+
+    with span('screener.rank'):
+        matched = snapshot[evaluate_expression(snapshot, tree)]
+        stocks = matched.sort_values(sort_by, ascending=ascending, na_position='last', kind='stable').head(limit)
+        stocks = stocks.reset_index(drop=True)
+        stocks.insert(0, 'rank', np.arange(1, len(stocks) + 1))
+
+    concepts = None
+    if concept_top and not stocks.empty and time.monotonic() < deadline:
+        top = stocks.head(concept_top)
+        tags = fetch_concept_tags(top['stock_code'].tolist(), deadline)
+        stocks['concept_tag'] = stocks['stock_code'].map(tags)
+        # 概念全部查询失败或超时时不统计，保留已取到的行情
+        concepts = concept_count(stocks) if tags else pd.DataFrame(columns=['concept', 'count', 'stocks'])
+
+    return ScreenResult(stocks, concepts, len(codes), len(snapshot), quotes.failed_codes, len(matched),
+                        time.monotonic() - start)
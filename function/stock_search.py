@@ -0,0 +1,156 @@
+# 股票模糊搜索
+# 在内存代码表上做代码前缀、名称子串和拼音首字母匹配，按匹配程度排序返回前k条
+import bisect
+import re
+import threading
+from symbol_index import get_symbol_index
+from perf import timed
+
+# 拼音首字母为可选功能，未安装pypinyin时跳过拼音匹配
+try:
+    from pypinyin import Style, lazy_pinyin
+    PINYIN_AVAILABLE = True
+except ImportError:
+    PINYIN_AVAILABLE = False
+
+# 匹配类型及排序优先级（数字越小越靠前）
+MATCH_EXACT_CODE = 0
+MATCH_EXACT_NAME = 1
+MATCH_CODE_PREFIX = 2
+MATCH_NAME_PREFIX = 3
+MATCH_PINYIN_PREFIX = 4
+MATCH_NAME_CONTAINS = 5
+MATCH_PINYIN_CONTAINS = 6
+
+MATCH_LABELS = {
+    MATCH_EXACT_CODE: "代码",
+    MATCH_EXACT_NAME: "名称",
+    MATCH_CODE_PREFIX: "代码前缀",
+    MATCH_NAME_PREFIX: "名称前缀",
+    MATCH_PINYIN_PREFIX: "拼音首字母",
+    MATCH_NAME_CONTAINS: "名称包含",
+    MATCH_PINYIN_CONTAINS: "拼音包含"
+}
+
+_SEPARATOR = '\n'
+_NON_ALNUM = re.compile(r'[^0-9a-z]')
+
+
+def name_initials(name):
+    """股票名称的拼音首字母，例如 贵州茅台 -> gzmt"""
+    if not PINYIN_AVAILABLE:
+        return ''
+    letters = ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER))
+    return _NON_ALNUM.sub('', letters.lower())
+
+
+class StockSearchIndex:
+    """基于代码表构建的搜索索引"""
+
+    def __init__(self, symbol_index):
+        self.symbol_index = symbol_index
+        self.codes = symbol_index.codes.tolist()
+        self.names = symbol_index.names.tolist()
+        self.initials = [name_initials(name) for name in self.names]
+        self.code_to_rows = {}
+        self.name_to_rows = {}
+        for row, (code, name) in enumerate(zip(self.codes, self.names)):
+            self.code_to_rows.setdefault(code, []).append(row)
+            self.name_to_rows.setdefault(name, []).append(row)
+
+        # 排序后的(值, 行号)，用于前缀二分查找
+        self.sorted_codes = sorted((code, row) for row, code in enumerate(self.codes))
+        self.sorted_names = sorted((name, row) for row, name in enumerate(self.names))
+        self.sorted_initials = sorted((ini, row) for row, ini in enumerate(self.initials) if ini)
+
+        # 拼接成一个大字符串，子串匹配交给str.find在C层完成
+        self.name_blob, self.name_offsets = self._build_blob(self.names)
+        self.initials_blob, self.initials_offsets = self._build_blob(self.initials)
+
+    @staticmethod
+    def _build_blob(values):
+        offsets = []
+        position = 0
+        for value in values:
+            offsets.append(position)
+            position += len(value) + len(_SEPARATOR)
+        return _SEPARATOR.join(values), offsets
+
+    @staticmethod
+    def _prefix_rows(sorted_pairs, prefix):
+        start = bisect.bisect_left(sorted_pairs, (prefix,))
+        rows = []
+        for value, row in sorted_pairs[start:]:
+            if not value.startswith(prefix):
+                break
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _contains_rows(blob, offsets, keyword):
+        rows = []
+        position = blob.find(keyword)
+        while position != -1:
+            row = bisect.bisect_right(offsets, position) - 1
+            rows.append(row)
+            # 跳到下一条记录，避免同一条记录重复命中
+            next_start = offsets[row + 1] if row + 1 < len(offsets) else len(blob)
+            position = blob.find(keyword, next_start)
+        return rows
+
+    def search(self, keyword, limit=10):
+        """搜索股票，返回[(stock_code, short_name, 匹配类型)]，limit为None时返回全部"""
+        keyword = (keyword or '').strip()
+        if not keyword or _SEPARATOR in keyword:
+            return []
+        lowered = keyword.lower()
+        is_ascii = lowered.isascii() and lowered.isalnum()
+
+        tiers = [
+            (MATCH_EXACT_CODE, lambda: self.code_to_rows.get(keyword, [])),
+            (MATCH_EXACT_NAME, lambda: self.name_to_rows.get(keyword, [])),
+            (MATCH_CODE_PREFIX, lambda: self._prefix_rows(self.sorted_codes, keyword)),
+            (MATCH_NAME_PREFIX, lambda: self._prefix_rows(self.sorted_names, keyword)),
+            (MATCH_PINYIN_PREFIX, lambda: self._prefix_rows(self.sorted_initials, lowered) if is_ascii else []),
+            (MATCH_NAME_CONTAINS, lambda: self._contains_rows(self.name_blob, self.name_offsets, keyword)),
+            (MATCH_PINYIN_CONTAINS, lambda: self._contains_rows(self.initials_blob, self.initials_offsets, lowered)
+             if is_ascii else [])
+        ]
+
+        results = []
+        seen = set()
+        for match_type, find_rows in tiers:
+            tier_rows = [row for row in find_rows() if row not in seen]
+            # 同一优先级内名称越短越接近，再按代码排序
+            tier_rows.sort(key=lambda row: (len(self.names[row]), self.codes[row]))
+            for row in tier_rows:
+                seen.add(row)
+                results.append((self.codes[row], self.names[row], match_type))
+            if limit is not None and len(results) >= limit:
+                break
+        return results if limit is None else results[:limit]
+
+
+_search_indexes = {}
+_search_lock = threading.Lock()
+
+
+def get_search_index(source='api'):
+    """获取搜索索引，代码表索引刷新后自动重建"""
+    symbol_index = get_symbol_index(source)
+    cached = _search_indexes.get(source)
+    if cached is not None and cached.symbol_index is symbol_index:
+        return cached
+    with _search_lock:
+        cached = _search_indexes.get(source)
+        if cached is None or cached.symbol_index is not symbol_index:
+            cached = StockSearchIndex(symbol_index)
+            if len(symbol_index):
+                _search_indexes[source] = cached
+    return cached
+
+
+@timed('stock_search.search')
+def search_stocks(keyword, limit=10, source='api'):
+    """模糊搜索股票，返回排序后的[(stock_code, short_name, 匹配类型)]"""
+    return get_search_index(source).search(keyword, limit)
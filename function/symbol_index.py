@@ -0,0 +1,128 @@
+# 股票代码表索引
+# 代码表只下载一次，之后代码->名称、名称->代码都是O(1)的哈希查找
+import threading
+import time
+import numpy as np
+import pandas as pd
+from data_fetch import get_fetcher
+from perf import timed
+
+DEFAULT_TTL = 1800  # 代码表刷新间隔（秒）
+RETRY_INTERVAL = 60  # 加载失败后至少等待多久（秒）再重新加载，期间沿用旧索引
+
+
+class SymbolIndex:
+    """股票代码表索引：代码/名称存成紧凑的numpy数组，另建代码->行、名称->行两个哈希表"""
+
+    def __init__(self, listing, version=None):
+        if listing is None or listing.empty:
+            listing = pd.DataFrame(columns=['stock_code', 'short_name'])
+        self.codes = listing['stock_code'].astype(str).to_numpy(dtype=str)
+        self.names = listing['short_name'].fillna('').astype(str).to_numpy(dtype=str)
+        self.code_to_row = {code: i for i, code in enumerate(self.codes.tolist())}
+        self.name_to_row = {}
+        for i, name in enumerate(self.names.tolist()):
+            self.name_to_row.setdefault(name, i)  # 重名时保留第一条
+        self.version = version
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, stock_code):
+        return stock_code in self.code_to_row
+
+    def name_of(self, stock_code):
+        """通过股票代码获取名称，未找到返回None"""
+        row = self.code_to_row.get(str(stock_code))
+        return None if row is None else str(self.names[row])
+
+    def code_of(self, short_name):
+        """通过股票名称获取代码，未找到返回None"""
+        row = self.name_to_row.get(short_name)
+        return None if row is None else str(self.codes[row])
+
+    def row(self, i):
+        """按行号取出一条记录"""
+        return {'stock_code': str(self.codes[i]), 'short_name': str(self.names[i])}
+
+    def to_frame(self):
+        """还原为DataFrame"""
+        return pd.DataFrame({'stock_code': self.codes, 'short_name': self.names})
+
+
+class SymbolIndexProvider:
+    """按TTL或版本变化刷新的索引持有者，并发请求只触发一次下载"""
+
+    def __init__(self, loader, ttl=DEFAULT_TTL, retry_interval=RETRY_INTERVAL):
+        self.loader = loader
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.index = None
+        self.retry_after = 0.0  # 上次加载失败后，此时间之前不再重新加载
+        self._lock = threading.Lock()
+
+    def _is_stale(self, version):
+        if time.time() < self.retry_after:
+            return False
+        if self.index is None:
+            return True
+        if version is not None and version != self.index.version:
+            return True
+        return time.time() - self.index.built_at > self.ttl
+
+    def get(self, version=None):
+        """获取索引，过期或版本变化时重新加载"""
+        if not self._is_stale(version):
+            return self.index if self.index is not None else SymbolIndex(None, version)
+        with self._lock:
+            if self._is_stale(version):
+                try:
+                    listing = self.loader()
+                except Exception as e:
+                    print(f"加载股票代码表失败: {e}")
+                    listing = None
+                if listing is not None and not listing.empty:
+                    self.index = SymbolIndex(listing, version)
+                else:
+                    # 加载失败时等待一段时间再重试，避免每次查找都在锁内重新下载
+                    self.retry_after = time.time() + self.retry_interval
+        if self.index is None:
+            # 没有旧索引时返回空索引，但不缓存，等待结束后继续尝试
+            return SymbolIndex(None, version)
+        return self.index
+
+    def invalidate(self):
+        """使索引失效，下次访问时重新加载"""
+        with self._lock:
+            self.index = None
+            self.retry_after = 0.0
+
+
+@timed('symbols.load_api')
+def _load_api_listing():
+    return get_fetcher().fetch('all_code')
+
+
+_providers = {'api': SymbolIndexProvider(_load_api_listing)}
+_providers_lock = threading.Lock()
+
+
+def register_symbol_source(source, loader, ttl=DEFAULT_TTL):
+    """注册一个代码表数据源"""
+    with _providers_lock:
+        if source not in _providers:
+            _providers[source] = SymbolIndexProvider(loader, ttl)
+    return _providers[source]
+
+
+def get_symbol_index(source='api', version=None):
+    """获取指定数据源的代码表索引"""
+    return _providers[source].get(version)
+
+
+def invalidate_symbol_index(source=None):
+    """使指定（或全部）数据源的索引失效"""
+    for name, provider in list(_providers.items()):
+        if source is None or name == source:
+            provider.invalidate()
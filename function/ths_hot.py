@@ -1,11 +1,14 @@
 # 同花顺热榜函数
-import adata
-from decimal import Decimal
 import pandas as pd
 from k_line import draw_kline
+from data_fetch import get_fetcher
+from quote_fetch import fetch_quotes
+from perf import timed
+
+PRICE_LIMIT = 20.0     # 只保留价格不高于此值的股票
 
 def code_draw(stock_code):
-    k_data = adata.stock.market.get_market_min(stock_code)
+    k_data = get_fetcher().fetch('market_min', stock_code)
     fig = draw_kline(k_data, stock_code)
     # 如果需要显示图形，可以调用 plt.show()
     import matplotlib.pyplot as plt
@@ -13,47 +16,134 @@ def code_draw(stock_code):
     return fig
 
 
+CONCEPT_SEPARATOR = ';'
+STOCK_JOINER = '、'
+
+
+def _concept_frame(rows):
+    """由[(概念, 次数, 股票)]生成与concept_count相同格式的结果（概念升序后按次数倒序）"""
+    concept_counts = pd.DataFrame(rows, columns=['concept', 'count', 'stocks'])
+    concept_counts['count'] = concept_counts['count'].astype('int64')
+    return concept_counts.sort_values('count', ascending=False)
+
+
 # 需要先运行main()函数获取result，然后传入concept_count函数
+@timed('ths.concept_count')
 def concept_count(result):
-    # 展开概念标签和股票名称
-    expanded = result[['concept_tag', 'short_name']].copy()
-    expanded = expanded.dropna(subset=['concept_tag'])
+    """统计每个概念出现的次数和对应股票（股票按在热榜中出现的顺序去重拼接）"""
+    expanded = result[['concept_tag', 'short_name']].dropna(subset=['concept_tag'])
+    # 全部概念查询失败时concept_tag可能是全NaN的数值列；只统计文本值，与ConceptCounter一致
+    if not isinstance(expanded['concept_tag'].dtype, pd.StringDtype):
+        expanded = expanded[[isinstance(tag, str) for tag in expanded['concept_tag']]]
+    if expanded.empty:
+        return _concept_frame([])
+    expanded = expanded.reset_index(drop=True)
     
-    # 分割概念并展开
-    expanded_list = []
-    for _, row in expanded.iterrows():
-        concepts = row['concept_tag'].split(';')
-        for concept in concepts:
-            concept = concept.strip()
-            if concept:
-                expanded_list.append({'concept': concept, 'short_name': row['short_name']})
+    # 分割概念并展开：一行一个(概念, 股票名称)，展开后的索引就是原来的行号
+    concepts = expanded['concept_tag'].str.split(CONCEPT_SEPARATOR).explode().str.strip()
+    names = expanded['short_name'].to_numpy()[concepts.index.to_numpy()]
+    pairs = pd.DataFrame({'concept': concepts.to_numpy(), 'short_name': names})
+    pairs = pairs[pairs['concept'].notna() & (pairs['concept'] != '') & pairs['short_name'].notna()]
+    if pairs.empty:
+        return _concept_frame([])
     
-    expanded_df = pd.DataFrame(expanded_list)
-    
-    # 统计概念出现次数和对应股票
-    concept_counts = expanded_df.groupby('concept').agg({
-        'short_name': ['count', lambda x: '、'.join(x.unique())]
-    }).reset_index()
-    
-    concept_counts.columns = ['concept', 'count', 'stocks']
-    concept_counts = concept_counts.sort_values('count', ascending=False)
-    
-    return concept_counts
+    # 概念转为分类类型，分组只比较整数编码；分类按概念升序排列，与按字符串分组的顺序一致
+    pairs['concept'] = pd.Categorical(pairs['concept'])
+    counts = pairs.groupby('concept', observed=True).size()
+    # 同一概念下的股票名称按首次出现的顺序去重后拼接
+    stocks = pairs.drop_duplicates().groupby('concept', observed=True)['short_name'].agg(STOCK_JOINER.join)
+    return _concept_frame(zip(counts.index.astype(str), counts.to_numpy(), stocks.reindex(counts.index).to_numpy()))
+
+
+def _split_concepts(concept_tag):
+    if not isinstance(concept_tag, str):
+        return []
+    return [c for c in (concept.strip() for concept in concept_tag.split(CONCEPT_SEPARATOR)) if c]
+
+
+class ConceptCounter:
+    """增量概念统计：按股票代码记住每只股票的概念，热榜刷新时只重新拆分发生变化的行
+
+    update(result)后to_frame()的结果与concept_count(result)相同
+    """
+
+    def __init__(self):
+        self.rows = {}      # stock_code -> (short_name, concept_tag)
+        self.members = {}   # 概念 -> {stock_code: 该股票中此概念出现的次数}
+        self.order = {}     # stock_code -> 在最新热榜中的行号
+        self.changed = 0    # 最近一次update中变化的行数
+
+    def _remove(self, code):
+        name, concept_tag = self.rows.pop(code)
+        for concept in _split_concepts(concept_tag):
+            members = self.members[concept]
+            members[code] -= 1
+            if not members[code]:
+                del members[code]
+                if not members:
+                    del self.members[concept]
+
+    def _add(self, code, name, concept_tag):
+        self.rows[code] = (name, concept_tag)
+        if not isinstance(name, str):
+            return
+        for concept in _split_concepts(concept_tag):
+            members = self.members.setdefault(concept, {})
+            members[code] = members.get(code, 0) + 1
+
+    def update(self, result):
+        """用最新的热榜更新统计，返回变化（新增、移除或内容改变）的行数"""
+        codes = result['stock_code'].astype(str).tolist()
+        if len(set(codes)) != len(codes):
+            raise ValueError("热榜中存在重复的股票代码，无法增量统计")
+        names = [name if isinstance(name, str) else None for name in result['short_name'].tolist()]
+        # 没有concept_tag列（例如概念全部查询失败）时按没有概念处理
+        tags = result['concept_tag'].tolist() if 'concept_tag' in result.columns else []
+        tags = [tag if isinstance(tag, str) else None for tag in tags] or [None] * len(codes)
+        order = {code: i for i, code in enumerate(codes)}
+        
+        changed = 0
+        for code in [code for code in self.rows if code not in order]:
+            self._remove(code)
+            changed += 1
+        for code, name, tag in zip(codes, names, tags):
+            if self.rows.get(code) != (name, tag):
+                if code in self.rows:
+                    self._remove(code)
+                self._add(code, name, tag)
+                changed += 1
+        self.order = order
+        self.changed = changed
+        return changed
+
+    def to_frame(self):
+        """输出与concept_count相同格式的统计结果"""
+        rows = []
+        for concept in sorted(self.members):
+            members = self.members[concept]
+            codes = sorted(members, key=self.order.__getitem__)
+            names = dict.fromkeys(self.rows[code][0] for code in codes)
+            rows.append((concept, sum(members.values()), STOCK_JOINER.join(names)))
+        return _concept_frame(rows)
 
 
+@timed('ths.get_merged_stock_data')
 def get_merged_stock_data():
     try:
-        df = adata.sentiment.hot.hot_rank_100_ths().loc[:, ['stock_code','pop_tag','concept_tag','change_pct']]
+        df = get_fetcher().fetch('hot_rank_ths').loc[:, ['stock_code','pop_tag','concept_tag','change_pct']]
         filtered_df = df[
             (df['change_pct'] > 0) & 
             (~df['stock_code'].str.startswith(('300')))]
         # 提取股票代码列表
         stock_code_list = filtered_df['stock_code'].tolist()
         print(f"提取到{len(stock_code_list)}只股票代码")
-        # 获取市场数据
-        df1 = adata.stock.market.list_market_current(code_list=stock_code_list).loc[:, ['stock_code','price','short_name','volume']] #code list pass the stock code
-        df1['price'] = df1['price'].apply(Decimal)
-        filtered_df1 = df1[(df1['price'] <= Decimal('20'))]
+        # 获取市场数据（分批同时请求，个别批次失败时保留其余股票）
+        quotes = fetch_quotes(stock_code_list, columns=['stock_code','price','short_name','volume'])
+        if quotes.partial:
+            print(f"{len(quotes.failed_codes)}只股票未获取到行情: {'、'.join(quotes.failed_codes)}")
+        df1 = quotes.quotes
+        # 调用层已把price转换为float32，直接向量化比较
+        filtered_df1 = df1[df1['price'] <= PRICE_LIMIT]
         # 合并数据
         merged_df = pd.merge(filtered_df, filtered_df1, on='stock_code', how='inner')
         return merged_df
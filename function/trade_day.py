@@ -1,21 +1,161 @@
-from datetime import date, timedelta
-import adata
+# 交易日历
+# 交易日按年批量下载并保存到本地文件，每天最多刷新一次；查询都是对有序日期列表的二分查找
+import bisect
+import json
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+import pandas as pd
+from data_fetch import get_fetcher
+
+CALENDAR_DIR = 'calendar_cache'
+CALENDAR_FILE = os.path.join(CALENDAR_DIR, 'trade_calendar.json')
+# 龙虎榜等盘后数据的发布时间，当天此时间之前视为当天数据尚未就绪
+DATA_READY_TIME = time(18, 0)
+
+
+def to_date(value):
+    """把str/datetime/date统一转换为date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.to_datetime(value).date()
+
+
+def _fetch_year(year):
+    """下载某一年的交易日历，返回该年所有交易日"""
+    calendar = get_fetcher().fetch('trade_calendar', year)
+    status = pd.to_numeric(calendar['trade_status'], errors='coerce') == 1
+    return [to_date(d) for d in calendar.loc[status, 'trade_date']]
+
+
+class TradingCalendar:
+    """本地持久化的交易日历"""
+
+    def __init__(self, calendar_file=CALENDAR_FILE, fetch_year=_fetch_year):
+        self.calendar_file = calendar_file
+        self.fetch_year = fetch_year
+        self.trading_days = []  # 升序排列的交易日
+        self.years = set()      # 已覆盖的年份
+        self.refreshed_on = {}  # 年份 -> 最近一次下载的日期
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """读取本地日历文件"""
+        try:
+            if os.path.exists(self.calendar_file):
+                with open(self.calendar_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.trading_days = sorted(date.fromisoformat(d) for d in data.get('trading_days', []))
+                self.years = set(data.get('years', []))
+                self.refreshed_on = {int(y): date.fromisoformat(d) for y, d in data.get('refreshed_on', {}).items()}
+        except Exception as e:
+            print(f"读取交易日历失败: {e}")
+            self.trading_days, self.years, self.refreshed_on = [], set(), {}
+
+    def _save(self):
+        """原子写入本地日历文件"""
+        os.makedirs(os.path.dirname(self.calendar_file) or '.', exist_ok=True)
+        data = {
+            'years': sorted(self.years),
+            'refreshed_on': {str(y): d.isoformat() for y, d in self.refreshed_on.items()},
+            'trading_days': [d.isoformat() for d in self.trading_days]
+        }
+        tmp_file = self.calendar_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.calendar_file)
+
+    def _needs_refresh(self, year):
+        # 缺少该年份时需要下载；当年的日历每天最多刷新一次，往年的日历不再变化
+        if year not in self.years:
+            return self.refreshed_on.get(year) != date.today()
+        return year >= date.today().year and self.refreshed_on.get(year, date.min) < date.today()
+
+    def ensure_years(self, years):
+        """确保日历覆盖指定年份，需要时按年批量下载"""
+        years = set(years)
+        if not any(self._needs_refresh(y) for y in years):
+            return
+        with self._lock:
+            changed = False
+            for year in sorted(years):
+                if not self._needs_refresh(year):
+                    continue
+                self.refreshed_on[year] = date.today()
+                changed = True
+                try:
+                    days = self.fetch_year(year)
+                except Exception as e:
+                    print(f"下载{year}年交易日历失败: {e}")
+                    continue
+                if days:
+                    others = [d for d in self.trading_days if d.year != year]
+                    self.trading_days = sorted(others + list(days))
+                    self.years.add(year)
+            if changed:
+                self._save()
+
+    def is_trading_day(self, check_date):
+        """是否为交易日"""
+        check_date = to_date(check_date)
+        self.ensure_years([check_date.year])
+        i = bisect.bisect_left(self.trading_days, check_date)
+        return i < len(self.trading_days) and self.trading_days[i] == check_date
+
+    def last_trading_day(self, on_or_before=None):
+        """不晚于指定日期的最近一个交易日"""
+        on_or_before = to_date(on_or_before or date.today())
+        self.ensure_years([on_or_before.year, on_or_before.year - 1])
+        i = bisect.bisect_right(self.trading_days, on_or_before)
+        return self.trading_days[i - 1] if i else None
+
+    def previous_trading_day(self, n=1, from_date=None):
+        """指定日期之前的第n个交易日（不含指定日期）"""
+        from_date = to_date(from_date or date.today())
+        self.ensure_years([from_date.year, from_date.year - 1])
+        i = bisect.bisect_left(self.trading_days, from_date) - n
+        return self.trading_days[i] if i >= 0 else None
+
+    def trading_days_between(self, start, end):
+        """[start, end]区间内的所有交易日"""
+        start, end = to_date(start), to_date(end)
+        self.ensure_years(range(start.year, end.year + 1))
+        lo = bisect.bisect_left(self.trading_days, start)
+        hi = bisect.bisect_right(self.trading_days, end)
+        return self.trading_days[lo:hi]
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar():
+    """获取进程内共享的交易日历"""
+    global _calendar
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                _calendar = TradingCalendar()
+    return _calendar
 
 
 def get_last_trading_day():
-    today = date.today()
-    
-    for i in range(10):
-        check_date = today - timedelta(days=i)
-        if is_trading_day(check_date):
-            return check_date.strftime('%Y-%m-%d')
-    
-    return today.strftime('%Y-%m-%d')
+    """最近一个盘后数据已发布的交易日"""
+    calendar = get_trading_calendar()
+    now = datetime.now()
+    today = now.date()
+    if calendar.is_trading_day(today) and now.time() >= DATA_READY_TIME:
+        last_day = today
+    else:
+        last_day = calendar.last_trading_day(today - timedelta(days=1))
+    return (last_day or today).strftime('%Y-%m-%d')
 
 
 def is_trading_day(check_date):
     try:
-        test_data = adata.sentiment.hot.list_a_list_daily(check_date)
-        return (hasattr(test_data, 'empty') and not test_data.empty) or len(test_data) > 0
+        return get_trading_calendar().is_trading_day(check_date)
     except Exception:
-        return False
\ No newline at end of file
+        return False
@@ -19,17 +19,21 @@ except ImportError:
     st.warning("项目介绍模块导入失败")
 
 # 导入自定义模块
+# function包把function目录加入sys.path，之后页面层按模块名导入功能模块，每个模块只加载一份
+import function
 from streamlit.utils_streamlit import (
     DataPersistence, safe_import, get_all_stock_codes, get_stock_data_cached,
-    get_stock_name_by_code, get_stock_code_by_name, save_kline_image,
-    save_kline_image_for_history, get_latest_kline_image, get_stock_name_from_db,
-    get_stock_code_from_db, fuzzy_search_stocks_from_db, query_stock_data
+    get_stock_name_by_code, get_stock_code_by_name, render_kline_outputs,
+    get_latest_kline_image, get_stock_name_from_db,
+    get_stock_code_from_db, fuzzy_search_stocks_from_db, search_stocks_from_db, query_stock_data
 )
 from streamlit.stock_streamlit import handle_stock_query, display_stock_info
 from streamlit.lhb_streamlit import handle_lhb_query
 from streamlit.ths_streamlit import handle_ths_hot
+from streamlit.screener_streamlit import handle_screener
 from streamlit.db_streamlit import handle_database_management
 from streamlit.history_streamlit import show_history_panel
+from streamlit.perf_streamlit import show_perf_panel, perf_request, set_request_name
 
 # 忽略警告信息
 warnings.filterwarnings('ignore')
@@ -72,11 +76,12 @@ def main():
         st.session_state.query_stock_code = None
         st.session_state.query_stock_name = None
         st.session_state.query_source = None
+        st.session_state.query_image = None
         st.session_state.hot_data = None
         st.session_state.hot_data_time = None
     
     # 顶部控制按钮
-    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    col1, col2, col3, col4, col5 = st.columns([1, 1, 1, 1, 1])
     with col1:
         if st.button("📋 切换侧边栏", help="点击隐藏或显示侧边栏"):
             if 'sidebar_visible' not in st.session_state:
@@ -88,10 +93,14 @@ def main():
             st.session_state.show_status = not st.session_state.get('show_status', False)
     
     with col3:
+        if st.button("⏱️ 性能", help="查看各环节耗时统计"):
+            st.session_state.show_perf = not st.session_state.get('show_perf', False)
+    
+    with col4:
         if st.button("❓ 快速帮助", help="查看快速使用指南"):
             st.session_state.show_help = not st.session_state.get('show_help', False)
     
-    with col4:
+    with col5:
         if st.button("📚 历史记录", help="查看操作历史记录"):
             st.session_state.show_history = not st.session_state.get('show_history', False)
     
@@ -112,6 +121,11 @@ def main():
                 show_status=st.session_state.get('show_status', False)
             )
     
+    # 显示性能面板
+    if st.session_state.get('show_perf', False):
+        show_perf_panel()
+        st.markdown("---")
+    
     # 显示历史记录面板
     if st.session_state.get('show_history', False):
         show_history_panel(data_persistence)
@@ -122,7 +136,7 @@ def main():
         st.sidebar.title("功能选择")
         function_choice = st.sidebar.selectbox(
             "选择功能模块",
-            ["股票查询与K线图", "龙虎榜查询", "同花顺热榜", "数据库管理"]
+            ["股票查询与K线图", "龙虎榜查询", "同花顺热榜", "全市场选股", "数据库管理"]
         )
         
         # 项目介绍
@@ -137,7 +151,7 @@ def main():
             st.rerun()
         
         # 显示最近操作
-        recent_history = data_persistence.load_operation_history()[-5:]  # 最近5条
+        recent_history = data_persistence.tail_operation_history(5)  # 最近5条
         if recent_history:
             st.sidebar.subheader("🕒 最近操作")
             for entry in reversed(recent_history):
@@ -152,6 +166,8 @@ def main():
                     display_text = f"龙虎榜: {metadata.get('target_code', 'N/A')}"
                 elif operation_type == 'ths_hot':
                     display_text = "同花顺热榜"
+                elif operation_type == 'ths_hot_live':
+                    display_text = "热榜变化"
                 else:
                     display_text = operation_type
                 
@@ -160,9 +176,11 @@ def main():
         # 当侧边栏隐藏时，使用下拉菜单
         function_choice = st.selectbox(
             "选择功能模块",
-            ["股票查询与K线图", "龙虎榜查询", "同花顺热榜", "数据库管理"]
+            ["股票查询与K线图", "龙虎榜查询", "同花顺热榜", "全市场选股", "数据库管理"]
         )
     
+    set_request_name(function_choice)
+    
     # 主要输入区域
     col1, col2 = st.columns(2)
     with col1:
@@ -177,18 +195,21 @@ def main():
         handle_stock_query(
             stock_code, short_name, data_persistence, MODULES, IMPORT_STATUS,
             get_stock_name_from_db, get_stock_code_from_db, fuzzy_search_stocks_from_db,
-            save_kline_image, save_kline_image_for_history, get_latest_kline_image,
-            query_stock_data, get_stock_code_by_name
+            render_kline_outputs, get_latest_kline_image,
+            query_stock_data, get_stock_code_by_name, search_stocks_from_db
         )
     elif function_choice == "龙虎榜查询":
         handle_lhb_query(stock_code, short_name, data_persistence, MODULES, IMPORT_STATUS)
     elif function_choice == "同花顺热榜":
         handle_ths_hot(
             data_persistence, MODULES, IMPORT_STATUS,
-            get_stock_name_by_code, get_stock_data_cached, save_kline_image_for_history
+            get_stock_name_by_code, get_stock_data_cached, render_kline_outputs
         )
+    elif function_choice == "全市场选股":
+        handle_screener(data_persistence, MODULES, IMPORT_STATUS)
     elif function_choice == "数据库管理":
         handle_database_management(data_persistence, MODULES, IMPORT_STATUS)
 
 if __name__ == "__main__":
-    main()
+    with perf_request("页面运行"):
+        main()
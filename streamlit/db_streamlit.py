@@ -31,7 +31,6 @@ def handle_database_management(data_persistence, MODULES, IMPORT_STATUS):
                         data_persistence.save_operation_history("db_connection_test", {"status": "success"}, metadata)
                         
                         st.success("数据库连接成功！结果已保存到历史记录")
-                        conn.close()
                     else:
                         metadata = {
                             "operation": "connection_test",
@@ -48,6 +47,22 @@ def handle_database_management(data_persistence, MODULES, IMPORT_STATUS):
                     data_persistence.save_operation_history("db_connection_test", {"status": "error", "error": str(e)}, metadata)
                     st.error(f"连接测试失败: {str(e)}")
     
+        # 连接池状态
+        if 'get_pool_stats' in MODULES.get('db_connect', {}):
+            if st.button("查看连接池状态", type="secondary"):
+                pool_stats = MODULES['db_connect']['get_pool_stats']()
+                col_pool1, col_pool2, col_pool3 = st.columns(3)
+                with col_pool1:
+                    st.metric("取连接次数", pool_stats["checkouts"])
+                    st.metric("新建连接数", pool_stats["new_connections"])
+                with col_pool2:
+                    st.metric("连接复用命中", pool_stats["pool_hits"])
+                    st.metric("复用命中率", f"{pool_stats['hit_rate']:.1%}")
+                with col_pool3:
+                    st.metric("平均取连接耗时", f"{pool_stats['checkout_ms_avg']:.2f} ms")
+                    st.metric("最大取连接耗时", f"{pool_stats['checkout_ms_max']:.2f} ms")
+                st.caption(f"连接池: {pool_stats['pool_status']}")
+    
     with col2:
         st.subheader("数据库更新")
         if st.button("更新数据库", type="secondary"):
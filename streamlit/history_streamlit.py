@@ -1,32 +1,51 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import glob
+import io
 import os
 import time
 import pickle
 from datetime import datetime
 
+# 每页显示的历史记录条数可选项
+HISTORY_PAGE_SIZES = [10, 20, 50]
+
+
+@st.cache_data(max_entries=20, show_spinner="正在生成导出文件...")
+def build_export(_data_persistence, data_file, columns, export_format):
+    """生成导出文件内容；数据文件写入后不再修改，按文件名、列和格式缓存"""
+    data = _data_persistence.load_operation_data(data_file, columns=list(columns) if columns else None)
+    if data is None:
+        return None
+    if export_format == "CSV":
+        return data.to_csv(index=False).encode('utf-8')
+    buffer = io.BytesIO()
+    data.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
 def show_history_panel(data_persistence):
     """显示历史记录面板"""
     st.header("📚 操作历史记录")
     
-    history = data_persistence.load_operation_history()
+    total_count = data_persistence.count_operation_history()
     
-    if not history:
+    if not total_count:
         st.info("暂无历史记录")
         return
     
+    type_counts = data_persistence.count_by_type()
+    operation_types = sorted(type_counts)
+    
     # 操作统计
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("总操作数", len(history))
+        st.metric("总操作数", total_count)
     with col2:
-        operation_types = [entry.get("operation_type", "unknown") for entry in history]
-        unique_types = len(set(operation_types))
-        st.metric("操作类型", unique_types)
+        st.metric("操作类型", len(type_counts))
     with col3:
-        recent_operations = len([h for h in history if 
-                               (datetime.now() - datetime.fromisoformat(h["timestamp"])).days < 1])
+        recent_operations = data_persistence.count_operation_history(since=datetime.now() - pd.Timedelta(days=1))
         st.metric("今日操作", recent_operations)
     with col4:
         if st.button("清空历史记录", type="secondary"):
@@ -38,118 +57,212 @@ def show_history_panel(data_persistence):
     
     # 筛选选项
     st.subheader("筛选历史记录")
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         operation_filter = st.selectbox(
             "按操作类型筛选",
-            ["全部"] + list(set(operation_types)),
+            ["全部"] + operation_types,
             index=0
         )
     
     with col2:
         days_filter = st.selectbox(
             "按时间筛选",
-            ["全部", "今天", "最近3天", "最近7天", "最近30天"],
+            ["全部", "今天", "最近3天", "最近7天", "最近30天", "自定义"],
             index=0
         )
     
-    # 应用筛选
-    filtered_history = history.copy()
+    with col3:
+        page_size = st.selectbox("每页条数", HISTORY_PAGE_SIZES, index=0)
     
-    if operation_filter != "全部":
-        filtered_history = [h for h in filtered_history if h.get("operation_type") == operation_filter]
+    keyword = st.text_input("搜索元数据", placeholder="股票代码、股票名称、龙虎榜代码等")
     
-    if days_filter != "全部":
+    # 筛选条件交给数据库处理，只取出当前页的记录
+    operation_type = None if operation_filter == "全部" else operation_filter
+    since = until = None
+    if days_filter == "自定义":
+        today = datetime.now().date()
+        date_range = st.date_input("日期范围", value=(today - pd.Timedelta(days=30), today))
+        if len(date_range) == 2:
+            since = date_range[0].isoformat()
+            until = (date_range[1] + pd.Timedelta(days=1)).isoformat()
+    elif days_filter != "全部":
         days_map = {"今天": 1, "最近3天": 3, "最近7天": 7, "最近30天": 30}
-        days = days_map[days_filter]
-        cutoff_date = datetime.now() - pd.Timedelta(days=days)
-        filtered_history = [h for h in filtered_history if 
-                          datetime.fromisoformat(h["timestamp"]) >= cutoff_date]
+        since = datetime.now() - pd.Timedelta(days=days_map[days_filter])
+    
+    filtered_count = data_persistence.count_operation_history(operation_type, since, until, keyword)
+    page_count = max(1, (filtered_count + page_size - 1) // page_size)
+    
+    with st.expander("📊 操作统计"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.caption("按操作类型")
+            st.dataframe(
+                pd.DataFrame(data_persistence.count_by_type(since, until, keyword).items(), columns=["操作类型", "次数"]),
+                use_container_width=True, hide_index=True
+            )
+        with col2:
+            st.caption("按日期")
+            daily_counts = data_persistence.count_by_day(operation_type, since, until, keyword)
+            if not daily_counts.empty:
+                st.bar_chart(daily_counts, x="date", y="count")
     
     # 显示历史记录
-    st.subheader(f"历史记录 ({len(filtered_history)} 条)")
+    st.subheader(f"历史记录 ({filtered_count} 条)")
+    page = st.number_input(f"页码（共 {page_count} 页）", min_value=1, max_value=page_count, value=1, step=1)
+    entries = data_persistence.query_operation_history(
+        operation_type, since, limit=page_size, offset=(page - 1) * page_size, until=until, keyword=keyword
+    )
+    
+    for entry in entries:
+        show_history_entry(data_persistence, entry)
+
+
+def show_history_entry(data_persistence, entry):
+    """显示一条历史记录；数据只在打开“加载数据”后才读取"""
+    operation_type = entry.get('operation_type', 'unknown')
+    timestamp = entry.get('timestamp', '')[:19]
+    key = entry['id']
     
-    for i, entry in enumerate(reversed(filtered_history[-50:])):  # 显示最近50条
-        operation_type = entry.get('operation_type', 'unknown')
-        timestamp = entry.get('timestamp', '')[:19]
+    # 构建更友好的标题
+    if operation_type == 'stock_query':
+        metadata = entry.get('metadata', {})
+        title = f"📊 股票查询: {metadata.get('stock_name', 'N/A')} ({metadata.get('stock_code', 'N/A')}) - {timestamp}"
+    elif operation_type == 'lhb_search':
+        metadata = entry.get('metadata', {})
+        title = f"🏆 龙虎榜查询: {metadata.get('target_code', 'N/A')} - {timestamp}"
+    elif operation_type == 'ths_hot':
+        title = f"🔥 同花顺热榜  - {timestamp}"
+    elif operation_type == 'concept_count':
+        title = f"📊 概念统计 - {timestamp}"
+    elif operation_type == 'ths_hot_live':
+        metadata = entry.get('metadata', {})
+        if metadata.get('kind') == 'baseline':
+            title = f"📡 实时热榜（初始快照）- {timestamp}"
+        else:
+            title = (f"📡 热榜变化: 新上榜{metadata.get('entries', 0)} 跌出{metadata.get('exits', 0)} "
+                     f"排名变化{metadata.get('moves', 0)} - {timestamp}")
+    elif operation_type == 'market_screen':
+        metadata = entry.get('metadata', {})
+        title = f"🔎 全市场选股: {metadata.get('expression', 'N/A')} - {timestamp}"
+    else:
+        title = f"{operation_type} - {timestamp}"
+    
+    with st.expander(title):
+        data_meta = entry.get('data_meta') or {}
+        if 'rows' in data_meta:
+            st.caption(f"数据形状: {data_meta['rows']} 行 × {len(data_meta['columns'])} 列")
         
-        # 构建更友好的标题
-        if operation_type == 'stock_query':
-            metadata = entry.get('metadata', {})
-            title = f"📊 股票查询: {metadata.get('stock_name', 'N/A')} ({metadata.get('stock_code', 'N/A')}) - {timestamp}"
-        elif operation_type == 'lhb_search':
+        # 展开面板的内容每次重跑都会执行，读取数据放在开关之后
+        if not st.toggle("加载数据", key=f"load_{key}"):
+            return
+        
+        # 检查是否为K线图相关操作
+        if operation_type in ['stock_query', 'hot_stock_kline']:
             metadata = entry.get('metadata', {})
-            title = f"🏆 龙虎榜查询: {metadata.get('target_code', 'N/A')} - {timestamp}"
-        elif operation_type == 'ths_hot':
-            title = f"🔥 同花顺热榜  - {timestamp}"
-        elif operation_type == 'concept_count':
-            title = f"📊 概念统计 - {timestamp}"
-        else:
-            title = f"{operation_type} - {timestamp}"
+            stock_code = metadata.get('stock_code')
+            if stock_code:
+                # 尝试显示K线图（文件扩展名随K线图格式配置变化，取最新的一张）
+                kline_images = glob.glob(f"image/{glob.escape(str(stock_code))}.*")
+                kline_image_path = max(kline_images, key=os.path.getmtime) if kline_images else None
+                if kline_image_path:
+                    st.image(kline_image_path, caption=f"{metadata.get('stock_name', 'N/A')} ({stock_code}) K线图", use_column_width=True)
+                else:
+                    st.warning("K线图文件不存在")
         
-        with st.expander(title):
-            # 检查是否为K线图相关操作
-            if operation_type in ['stock_query', 'hot_stock_kline']:
-                metadata = entry.get('metadata', {})
-                stock_code = metadata.get('stock_code')
-                if stock_code:
-                    # 尝试显示K线图
-                    kline_image_path = f"image/{stock_code}.png"
-                    if os.path.exists(kline_image_path):
-                        st.image(kline_image_path, caption=f"{metadata.get('stock_name', 'N/A')} ({stock_code}) K线图", use_column_width=True)
-                    else:
-                        st.warning("K线图文件不存在")
-            
-            # 显示历史数据（如果存在且不是K线图操作）
-            if entry.get('data_file'):
+        # 显示历史数据（如果存在且不是K线图操作）
+        if entry.get('data_file'):
+            if 'rows' in data_meta:
+                # 元数据中已有行数和列信息，按查看方式只读取需要的行和列
+                show_dataframe_entry(data_persistence, entry, data_meta, operation_type, timestamp, key)
+            else:
                 data = data_persistence.load_operation_data(entry['data_file'])
-                if data is not None:
-                    if isinstance(data, pd.DataFrame):
-                        # 显示数据形状信息
-                        st.info(f"数据形状: {data.shape[0]} 行 × {data.shape[1]} 列")
-                        
-                        # 查看方式选择
-                        view_option = st.radio(
-                            "查看方式",
-                            ["完整数据", "前10行", "后10行", "数据统计"],
-                            horizontal=True,
-                            key=f"view_option_{i}"
-                        )
-                        
-                        if view_option == "完整数据":
-                            st.dataframe(data, use_container_width=True, height=400)
-                        elif view_option == "前10行":
-                            st.dataframe(data.head(10), use_container_width=True)
-                        elif view_option == "后10行":
-                            st.dataframe(data.tail(10), use_container_width=True)
-                        elif view_option == "数据统计":
-                            if data.select_dtypes(include=[np.number]).shape[1] > 0:
-                                st.subheader("📈 数值列统计")
-                                st.dataframe(data.describe(), use_container_width=True)
-                            
-                            st.subheader("📋 数据信息")
-                            info_data = {
-                                "列名": data.columns.tolist(),
-                                "数据类型": data.dtypes.astype(str).tolist(),
-                                "非空值数量": data.count().tolist(),
-                                "空值数量": data.isnull().sum().tolist()
-                            }
-                            info_df = pd.DataFrame(info_data)
-                            st.dataframe(info_df, use_container_width=True)
-                        
-                        # 数据导出功能
-                        csv = data.to_csv(index=False)
-                        st.download_button(
-                            label="💾 导出CSV文件",
-                            data=csv,
-                            file_name=f"{operation_type}_{timestamp.replace(':', '-')}.csv",
-                            mime="text/csv",
-                            key=f"download_{i}"
-                        )
-                    else:
-                        # 对于非DataFrame数据，使用JSON显示
-                        st.json(data)
-                else:
+                if data is None:
                     st.error("❌ 无法加载历史数据，文件可能已损坏或被删除")
+                elif isinstance(data, pd.DataFrame):
+                    # 旧记录没有元数据，读取后补算
+                    data_meta = {
+                        "rows": data.shape[0],
+                        "columns": [str(c) for c in data.columns],
+                        "dtypes": [str(t) for t in data.dtypes]
+                    }
+                    show_dataframe_entry(data_persistence, entry, data_meta, operation_type, timestamp, key)
+                else:
+                    # 对于非DataFrame数据，使用JSON显示
+                    st.json(data)
+
 
+def show_dataframe_entry(data_persistence, entry, data_meta, operation_type, timestamp, key):
+    """显示一条DataFrame历史数据"""
+    all_columns = data_meta["columns"]
+    # 数据形状和列类型直接取自元数据，无需读取数据
+    st.info(f"数据形状: {data_meta['rows']} 行 × {len(all_columns)} 列")
+    st.caption("列类型: " + "，".join(f"{c}({t})" for c, t in zip(all_columns, data_meta["dtypes"])))
+    
+    selected_columns = st.multiselect("显示列", all_columns, default=all_columns, key=f"columns_{key}")
+    # 全部列时不做列投影
+    columns = None if len(selected_columns) == len(all_columns) else selected_columns
+    
+    # 查看方式选择
+    view_option = st.radio(
+        "查看方式",
+        ["完整数据", "前10行", "后10行", "数据统计"],
+        index=1,
+        horizontal=True,
+        key=f"view_option_{key}"
+    )
+    
+    if view_option == "前10行":
+        data = data_persistence.load_operation_data(entry['data_file'], columns=columns, head=10)
+    elif view_option == "后10行":
+        data = data_persistence.load_operation_data(entry['data_file'], columns=columns, tail=10)
+    else:
+        data = data_persistence.load_operation_data(entry['data_file'], columns=columns)
+    if data is None:
+        st.error("❌ 无法加载历史数据，文件可能已损坏或被删除")
+        return
+    
+    if view_option == "完整数据":
+        st.dataframe(data, use_container_width=True, height=400)
+    elif view_option in ("前10行", "后10行"):
+        st.dataframe(data, use_container_width=True)
+    elif view_option == "数据统计":
+        if data.select_dtypes(include=[np.number]).shape[1] > 0:
+            st.subheader("📈 数值列统计")
+            st.dataframe(data.describe(), use_container_width=True)
+        
+        st.subheader("📋 数据信息")
+        info_data = {
+            "列名": data.columns.tolist(),
+            "数据类型": data.dtypes.astype(str).tolist(),
+            "非空值数量": data.count().tolist(),
+            "空值数量": data.isnull().sum().tolist()
+        }
+        info_df = pd.DataFrame(info_data)
+        st.dataframe(info_df, use_container_width=True)
+    
+    # 数据导出：点击后才生成文件，生成结果会被缓存
+    col1, col2 = st.columns(2)
+    with col1:
+        export_format = st.selectbox("导出格式", ["CSV", "Parquet"], key=f"export_format_{key}")
+    with col2:
+        if st.button("📦 生成导出文件", key=f"export_{key}"):
+            st.session_state[f"export_ready_{key}"] = True
+    if st.session_state.get(f"export_ready_{key}"):
+        try:
+            export_data = build_export(data_persistence, entry['data_file'], tuple(columns or ()), export_format)
+        except Exception as e:
+            # 例如混合类型的列无法写入Parquet；清除生成状态，避免每次重新运行都重复报错
+            st.session_state[f"export_ready_{key}"] = False
+            st.error(f"生成{export_format}文件失败: {e}，可以改用CSV格式导出")
+            export_data = None
+        if export_data is not None:
+            extension, mime = ("csv", "text/csv") if export_format == "CSV" else ("parquet", "application/octet-stream")
+            st.download_button(
+                label=f"💾 导出{export_format}文件",
+                data=export_data,
+                file_name=f"{operation_type}_{timestamp.replace(':', '-')}.{extension}",
+                mime=mime,
+                key=f"download_{key}"
+            )
@@ -324,6 +324,64 @@ def handle_lhb_query(stock_code, short_name, data_persistence, MODULES, IMPORT_S
                         st.error(f"获取数据过程中出现错误: {str(e)}")
     else:
         st.warning("请输入股票代码或股票名称")
+    
+    # 全部明细：批量并发获取多只股票的龙虎榜明细
+    if 'iter_lhb_many' in MODULES['lhb']:
+        st.subheader("📋 全部明细")
+        batch_codes_text = st.text_area("股票代码或名称（逗号、空格或换行分隔，留空则获取当日榜单全部股票）",
+                                        key="lhb_batch_codes")
+        if st.button("获取全部明细", type="secondary"):
+            try:
+                batch_codes = [c for c in batch_codes_text.replace(',', ' ').replace('，', ' ').split() if c]
+                if not batch_codes:
+                    with st.spinner("正在获取当日龙虎榜..."):
+                        batch_codes = MODULES['lhb']['list_lhb_codes']()
+                if not batch_codes:
+                    st.info("当日龙虎榜暂无数据")
+                    return
+                
+                # 名称解析为代码并去重，进度和记录的股票数按实际请求的股票计算
+                resolved_codes, missing = MODULES['lhb']['resolve_lhb_codes'](batch_codes)
+                failed = [f"{code}(没有上龙虎榜)" for code in missing]
+                
+                total = len(resolved_codes)
+                progress = st.progress(0.0, text=f"0/{total}")
+                table_placeholder = st.empty()
+                frames = []
+                # 每完成一只股票就刷新一次表格
+                for done, (code, detail, error) in enumerate(MODULES['lhb']['iter_lhb_many'](resolved_codes), start=1):
+                    if detail is not None:
+                        frames.append(detail)
+                        table_placeholder.dataframe(pd.concat(frames, ignore_index=True), use_container_width=True)
+                    else:
+                        failed.append(f"{code}({error})")
+                    progress.progress(done / total, text=f"{done}/{total}")
+                
+                if frames:
+                    result = pd.concat(frames, ignore_index=True)
+                    metadata = {
+                        "target_code": f"{total}只股票",
+                        "stock_count": result['stock_code'].nunique(),
+                        "query_type": "find_lhb_many"
+                    }
+                    data_persistence.save_operation_history("lhb_detail_batch", result, metadata)
+                    st.success(f"获取{result['stock_code'].nunique()}只股票龙虎榜明细成功！数据已保存到历史记录")
+                    
+                    # 上榜股票的最新行情（分批并发请求，个别批次失败不影响其余股票）
+                    if 'fetch_quotes' in MODULES.get('quotes', {}):
+                        with st.spinner("正在获取最新行情..."):
+                            quotes = MODULES['quotes']['fetch_quotes'](result['stock_code'].unique().tolist())
+                        if not quotes.quotes.empty:
+                            st.subheader("📈 最新行情")
+                            st.dataframe(quotes.quotes, use_container_width=True, hide_index=True)
+                        if quotes.partial:
+                            st.warning("未获取到行情: " + "、".join(quotes.failed_codes))
+                else:
+                    st.info("未找到相关龙虎榜数据")
+                if failed:
+                    st.warning("未获取到: " + "、".join(failed))
+            except Exception as e:
+                st.error(f"批量获取过程中出现错误: {str(e)}")
 
 def handle_ths_hot():
     """处理同花顺热榜"""
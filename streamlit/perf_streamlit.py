@@ -0,0 +1,70 @@
+import streamlit as st
+import pandas as pd
+from contextlib import nullcontext
+
+# 性能计时汇总（function目录不可用时面板显示提示）
+try:
+    from perf import PERF_LOG_ENV, current_request, get_perf_recorder, request_scope
+except ImportError:
+    get_perf_recorder = None
+
+
+def perf_request(name):
+    """把一次页面运行中的计时归为一个请求"""
+    return request_scope(name) if get_perf_recorder is not None else nullcontext()
+
+
+def set_request_name(name):
+    """设置当前请求的名称（例如所选功能模块）"""
+    if get_perf_recorder is not None and current_request() is not None:
+        current_request().name = name
+
+
+def show_perf_panel():
+    """显示性能面板：各热点路径最近耗时的p50/p95，以及最近几次页面运行的耗时明细"""
+    st.header("⏱️ 性能")
+
+    if get_perf_recorder is None:
+        st.warning("性能计时模块未加载")
+        return
+
+    recorder = get_perf_recorder()
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        if recorder.log_path:
+            st.caption(f"计时明细写入: {recorder.log_path}")
+        else:
+            st.caption(f"设置环境变量 {PERF_LOG_ENV}=文件路径 可把计时明细写成JSON行")
+    with col2:
+        if st.button("清空计时", type="secondary"):
+            recorder.clear()
+            st.rerun()
+
+    # 滚动窗口统计
+    st.subheader("📊 热点耗时（最近调用）")
+    stats = recorder.stats()
+    if stats.empty:
+        st.info("暂无计时数据")
+    else:
+        st.dataframe(
+            stats.round({'p50_ms': 2, 'p95_ms': 2, 'max_ms': 2, 'total_ms': 1}),
+            use_container_width=True, hide_index=True
+        )
+
+    # 最近的页面运行
+    st.subheader("🕒 最近页面运行")
+    requests = recorder.recent_requests(10)
+    if not requests:
+        st.info("暂无页面运行记录")
+        return
+    for request in requests:
+        title = (f"{request.started_at.strftime('%H:%M:%S')} - {request.name} - "
+                 f"{(request.elapsed or 0) * 1000:.0f} ms")
+        with st.expander(title):
+            summary = request.summary()
+            if summary.empty:
+                st.caption("没有计时记录")
+            else:
+                # 不同线程中的计时可能重叠，合计可能超过总耗时
+                st.dataframe(summary.round({'total_ms': 2}), use_container_width=True, hide_index=True)
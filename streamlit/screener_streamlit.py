@@ -0,0 +1,86 @@
+import streamlit as st
+import pandas as pd
+
+
+def handle_screener(data_persistence, MODULES, IMPORT_STATUS):
+    """全市场选股"""
+    st.header("🔎 全市场选股")
+
+    if not IMPORT_STATUS.get('screener', False) or 'run_screen' not in MODULES.get('screener', {}):
+        st.error("选股模块未正确加载，无法使用此功能")
+        return
+
+    screener = MODULES['screener']
+    columns = screener['QUOTE_COLUMNS']
+
+    expression = st.text_input(
+        "筛选表达式", value=screener['DEFAULT_EXPRESSION'], key="screen_expression",
+        help=f"可用列: {', '.join(columns)}；支持比较、and/or/not、四则运算、in (...)，"
+             "以及 stock_code.startswith('300') / short_name.contains('银行') 等字符串方法"
+    )
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort_columns = [c for c in columns if c not in ('stock_code', 'short_name')]
+        sort_by = st.selectbox("排序列", sort_columns, index=sort_columns.index(screener['DEFAULT_SORT']),
+                               key="screen_sort")
+    with col2:
+        ascending = st.radio("排序方向", ["从高到低", "从低到高"], horizontal=True, key="screen_order") == "从低到高"
+    with col3:
+        limit = st.number_input("返回数量", min_value=10, max_value=500, value=50, step=10, key="screen_limit")
+    with col4:
+        budget = st.number_input("时间预算(秒)", min_value=3.0, max_value=60.0,
+                                 value=float(screener['SCREEN_BUDGET']), step=1.0, key="screen_budget")
+    with_concepts = st.checkbox("统计前30只股票的所属概念", value=True, key="screen_concepts")
+
+    if st.button("开始选股", type="primary"):
+        # 先检查表达式，避免无效请求
+        try:
+            screener['compile_expression'](expression)
+        except screener['ScreenExpressionError'] as e:
+            st.error(str(e))
+            return
+        with st.spinner("正在获取全市场行情并筛选..."):
+            try:
+                result = screener['run_screen'](
+                    expression, sort_by=sort_by, ascending=ascending, limit=int(limit),
+                    budget=float(budget), concept_top=30 if with_concepts else 0
+                )
+            except Exception as e:
+                st.error(f"选股过程中出现错误: {str(e)}")
+                return
+
+        if not result.stocks.empty:
+            metadata = {
+                "query_type": "market_screen",
+                "expression": expression,
+                "sort_by": sort_by,
+                "matched": result.matched,
+                "coverage": round(result.coverage, 4)
+            }
+            data_persistence.save_operation_history("market_screen", result.stocks, metadata)
+        st.session_state.screen_result = result
+
+    result = st.session_state.get('screen_result')
+    if result is None:
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("全市场", result.universe)
+    col2.metric("取到行情", result.fetched, f"{result.coverage:.1%}", delta_color="off")
+    col3.metric("满足条件", result.matched)
+    col4.metric("耗时", f"{result.elapsed:.1f} 秒")
+    if result.partial:
+        st.warning(f"有 {len(result.failed_codes)} 只股票的行情在时间预算内没有取到，结果只覆盖已取到的股票")
+
+    if result.stocks.empty:
+        st.warning("没有满足条件的股票")
+        return
+    st.success(f"选股完成，显示前 {len(result.stocks)} 只股票，结果已保存到历史记录")
+    st.dataframe(result.stocks, use_container_width=True, hide_index=True)
+
+    if result.concepts is not None:
+        st.subheader("📊 概念分布")
+        if result.concepts.empty:
+            st.info("没有查询到概念数据")
+        else:
+            st.dataframe(result.concepts, use_container_width=True, hide_index=True)
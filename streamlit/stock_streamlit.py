@@ -25,8 +25,8 @@ def display_stock_info(k_data, stock_code, stock_name, data_source):
 
 def handle_stock_query(stock_code, short_name, data_persistence, MODULES, IMPORT_STATUS, 
                       get_stock_name_from_db, get_stock_code_from_db, fuzzy_search_stocks_from_db,
-                      save_kline_image, save_kline_image_for_history, get_latest_kline_image,
-                      query_stock_data, get_stock_code_by_name):
+                      render_kline_outputs, get_latest_kline_image,
+                      query_stock_data, get_stock_code_by_name, search_stocks_from_db=None):
     """处理股票查询和K线图绘制"""
     st.header("📊 股票查询与K线图")
     
@@ -44,6 +44,17 @@ def handle_stock_query(stock_code, short_name, data_persistence, MODULES, IMPORT
     if data_source == "数据库查询" and not IMPORT_STATUS.get('db_connect', False):
         st.warning("⚠️ 数据库连接模块未正确加载，请先测试数据库连接")
     
+    # 模糊查询：边输入边搜索
+    if data_source == "数据库模糊查询" and search_stocks_from_db is not None:
+        search_keyword = st.text_input("搜索股票", placeholder="输入代码、名称或拼音首字母，例如: 600, 茅台, gzmt",
+                                       key="stock_search_keyword")
+        if search_keyword:
+            search_results = search_stocks_from_db(search_keyword, 20)
+            if search_results is not None and not search_results.empty:
+                st.dataframe(search_results, use_container_width=True, hide_index=True)
+            else:
+                st.info(f"未找到匹配'{search_keyword}'的股票")
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -53,10 +64,8 @@ def handle_stock_query(stock_code, short_name, data_persistence, MODULES, IMPORT
                     k_data, final_stock_name, final_code = query_stock_data(stock_code, "未知", data_source, 
                                                                           get_stock_name_from_db, get_stock_code_from_db)
                     if k_data is not None:
-                        save_kline_image(k_data, final_code, final_stock_name, MODULES)
-                        
-                        # 保存K线图到历史记录
-                        save_kline_image_for_history(k_data, final_code, final_stock_name, MODULES)
+                        # 绘制一次K线图，同时保存时间戳图片、历史记录图片和页面显示图片
+                        kline_outputs = render_kline_outputs(k_data, final_code, final_stock_name, MODULES)
                         
                         # 保存到持久化存储
                         metadata = {
@@ -72,6 +81,7 @@ def handle_stock_query(stock_code, short_name, data_persistence, MODULES, IMPORT
                         st.session_state.query_stock_code = final_code
                         st.session_state.query_stock_name = final_stock_name
                         st.session_state.query_source = data_source
+                        st.session_state.query_image = kline_outputs.get("display")
                         
                         st.success("查询成功！数据已保存到历史记录")
                         display_stock_info(k_data, final_code, final_stock_name, data_source)
@@ -111,10 +121,8 @@ def handle_stock_query(stock_code, short_name, data_persistence, MODULES, IMPORT
                         k_data, final_stock_name, final_code = query_stock_data(found_code, short_name, data_source,
                                                                               get_stock_name_from_db, get_stock_code_from_db)
                         if k_data is not None:
-                            save_kline_image(k_data, final_code, final_stock_name, MODULES)
-                            
-                            # 保存K线图到历史记录
-                            save_kline_image_for_history(k_data, final_code, final_stock_name, MODULES)
+                            # 绘制一次K线图，同时保存时间戳图片、历史记录图片和页面显示图片
+                            kline_outputs = render_kline_outputs(k_data, final_code, final_stock_name, MODULES)
                             
                             # 保存到持久化存储
                             metadata = {
@@ -130,6 +138,7 @@ def handle_stock_query(stock_code, short_name, data_persistence, MODULES, IMPORT
                             st.session_state.query_stock_code = final_code
                             st.session_state.query_stock_name = final_stock_name
                             st.session_state.query_source = data_source
+                            st.session_state.query_image = kline_outputs.get("display")
                             
                             st.success("查询成功！数据已保存到历史记录")
                             display_stock_info(k_data, final_code, final_stock_name, data_source)
@@ -143,10 +152,14 @@ def handle_stock_query(stock_code, short_name, data_persistence, MODULES, IMPORT
         st.subheader("📈 生成K线图")
         if st.button("显示K线图", type="primary"):
             try:
-                image_path = get_latest_kline_image(st.session_state.query_stock_code)
-                if image_path and os.path.exists(image_path):
+                image = st.session_state.get('query_image')
+                if image is None:
+                    image_path = get_latest_kline_image(st.session_state.query_stock_code)
+                    if image_path and os.path.exists(image_path):
+                        image = image_path
+                if image is not None:
                     st.success("K线图生成成功！")
-                    st.image(image_path, caption=f"{st.session_state.query_stock_name} ({st.session_state.query_stock_code}) K线图", use_column_width=True)
+                    st.image(image, caption=f"{st.session_state.query_stock_name} ({st.session_state.query_stock_code}) K线图", use_column_width=True)
                     display_stock_info(st.session_state.query_result, st.session_state.query_stock_code, st.session_state.query_stock_name, st.session_state.query_source)
                 else:
                     st.error("未找到保存的K线图，请重新查询")
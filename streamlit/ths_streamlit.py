@@ -6,8 +6,123 @@ import time
 import pickle
 from datetime import datetime
 
+# 热榜数值列的排序索引（function目录不可用时退回逐次布尔掩码筛选）
+try:
+    from range_index import SortedColumnIndex
+except ImportError:
+    SortedColumnIndex = None
+
+# 实时热榜（所有会话共享一个后台刷新器）
+try:
+    from hot_refresher import HotListRefresher, HOT_MIN_INTERVAL
+except ImportError:
+    HotListRefresher = None
+
+HOT_FILTER_COLUMNS = ['price', 'change_pct', 'volume']
+LIVE_POLL_SECONDS = 5  # 实时模式下页面片段的重跑间隔（只读取共享快照，不请求接口）
+
+
+def get_hot_index(hot_data):
+    """热榜数据的排序索引，数据替换后重新创建"""
+    index = st.session_state.get('hot_index')
+    if index is None or index.data is not hot_data:
+        index = SortedColumnIndex(hot_data, HOT_FILTER_COLUMNS)
+        st.session_state.hot_index = index
+    return index
+
+
+@st.cache_resource
+def get_hot_refresher(_data_persistence):
+    """所有会话共享的热榜刷新器；第一次的完整热榜和之后的变化行保存到历史记录"""
+    def save_delta(kind, data, info):
+        metadata = {"query_type": "hot_list_live", "kind": kind, **info}
+        _data_persistence.save_operation_history("ths_hot_live", data, metadata)
+    
+    refresher = HotListRefresher(on_delta=save_delta)
+    refresher.start()
+    return refresher
+
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def show_live_hot(refresher):
+    """实时热榜片段：定时重跑，显示共享快照和排名变化"""
+    refresher.touch()
+    version, snapshot, updated_at, last_diff, error = refresher.state()
+    if error:
+        st.warning(error)
+    if snapshot is None:
+        st.info("正在获取热榜...")
+        return
+    
+    # 有新版本时提示本次的变化
+    if st.session_state.get('live_seen_version') != version:
+        if st.session_state.get('live_seen_version') is not None and not last_diff.empty:
+            st.toast(f"热榜已更新: {len(last_diff)} 只股票排名变化")
+        st.session_state.live_seen_version = version
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("更新时间", updated_at.strftime('%H:%M:%S'))
+    col2.metric("新上榜", int((last_diff['change'] == '新上榜').sum()))
+    col3.metric("跌出榜单", int((last_diff['change'] == '跌出榜单').sum()))
+    col4.metric("排名变化", int(last_diff['change'].isin(['排名上升', '排名下降']).sum()))
+    
+    # 热榜附带最近一次刷新的排名变化
+    rank_delta = last_diff.set_index('stock_code')['rank_delta']
+    st.dataframe(snapshot.assign(rank_delta=snapshot['stock_code'].map(rank_delta)),
+                 use_container_width=True, hide_index=True)
+    
+    with st.expander("本次查看以来的变化"):
+        changes = refresher.changes_since(st.session_state.live_since)
+        if changes.empty:
+            st.caption("暂无变化")
+        else:
+            st.dataframe(changes, use_container_width=True, hide_index=True)
+    with st.expander("概念分布"):
+        if refresher.concept_counts is not None:
+            st.dataframe(refresher.concept_counts, use_container_width=True, hide_index=True)
+
+
+def apply_live_interval(refresher):
+    """刷新间隔输入框的回调：把用户输入的间隔应用到共享刷新器"""
+    refresher.set_interval(st.session_state.hot_live_interval)
+
+
+def show_live_section(data_persistence):
+    """实时模式开关和刷新间隔设置"""
+    if HotListRefresher is None:
+        return
+    if not st.toggle("📡 实时模式", key="hot_live", help="后台定时刷新热榜，所有用户共享同一份数据"):
+        st.session_state.pop('live_since', None)
+        return
+    
+    refresher = get_hot_refresher(data_persistence)
+    if 'live_since' not in st.session_state:
+        st.session_state.live_since = datetime.now()
+        st.session_state.live_seen_version = None
+    # 输入框显示共享刷新器的当前间隔（可能已被其他用户修改），只有用户修改输入框时才改变刷新器
+    st.session_state.hot_live_interval = float(refresher.interval)
+    st.number_input("刷新间隔(秒)", min_value=float(HOT_MIN_INTERVAL), max_value=600.0, step=10.0,
+                    key="hot_live_interval", on_change=apply_live_interval, args=(refresher,),
+                    help="刷新间隔对所有用户生效")
+    st.caption("只保存第一次的完整热榜和之后的变化行，历史记录类型为 ths_hot_live")
+    show_live_hot(refresher)
+    st.markdown("---")
+
+
+def filter_hot_data(hot_data, price_filter, change_filter, volume_filter):
+    """用布尔掩码筛选热榜（NaN参与比较结果为False，无需单独过滤）"""
+    mask = np.ones(len(hot_data), dtype=bool)
+    if 'price' in hot_data.columns:
+        mask &= (hot_data['price'] <= price_filter).to_numpy()
+    if 'change_pct' in hot_data.columns:
+        mask &= (hot_data['change_pct'] >= change_filter).to_numpy()
+    if 'volume' in hot_data.columns:
+        mask &= (hot_data['volume'] >= volume_filter * 10000).to_numpy()
+    return hot_data if mask.all() else hot_data[mask]
+
+
 def handle_ths_hot(data_persistence, MODULES, IMPORT_STATUS, 
-                   get_stock_name_by_code, get_stock_data_cached, save_kline_image_for_history):
+                   get_stock_name_by_code, get_stock_data_cached, render_kline_outputs):
     """处理同花顺热榜"""
     st.header("🔥 同花顺热榜")
     
@@ -15,6 +130,8 @@ def handle_ths_hot(data_persistence, MODULES, IMPORT_STATUS,
         st.error("同花顺热榜模块未正确加载，无法使用此功能")
         return
     
+    show_live_section(data_persistence)
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -60,31 +177,24 @@ def handle_ths_hot(data_persistence, MODULES, IMPORT_STATUS,
             with col_filter3:
                 volume_filter = st.number_input("成交量下限(万)", min_value=0.0, max_value=10000.0, value=0.0, step=100.0)
             
-            filtered_data = st.session_state.hot_data.copy()
+            hot_data = st.session_state.hot_data
             
-            # 数据类型转换和清理
+            # 热榜数据在获取时已转换为数值类型，筛选时不复制、不重复转换
             try:
-                if 'price' in filtered_data.columns:
-                    # 确保price列为数值类型
-                    filtered_data['price'] = pd.to_numeric(filtered_data['price'], errors='coerce')
-                    # 过滤掉NaN值
-                    filtered_data = filtered_data[filtered_data['price'].notna() & (filtered_data['price'] <= price_filter)]
-                
-                if 'change_pct' in filtered_data.columns:
-                    # 确保change_pct列为数值类型
-                    filtered_data['change_pct'] = pd.to_numeric(filtered_data['change_pct'], errors='coerce')
-                    # 过滤掉NaN值
-                    filtered_data = filtered_data[filtered_data['change_pct'].notna() & (filtered_data['change_pct'] >= change_filter)]
-                
-                if 'volume' in filtered_data.columns:
-                    # 确保volume列为数值类型
-                    filtered_data['volume'] = pd.to_numeric(filtered_data['volume'], errors='coerce')
-                    # 过滤掉NaN值
-                    filtered_data = filtered_data[filtered_data['volume'].notna() & (filtered_data['volume'] >= volume_filter * 10000)]
+                if SortedColumnIndex is not None:
+                    # 排序索引+searchsorted求区间，结果按(数据版本, 阈值)缓存
+                    filtered_data = get_hot_index(hot_data).filter(
+                        price=(None, price_filter),
+                        change_pct=(change_filter, None),
+                        volume=(volume_filter * 10000, None)
+                    )
+                else:
+                    filtered_data = filter_hot_data(hot_data, price_filter, change_filter, volume_filter)
             except Exception as e:
                 st.warning(f"数据筛选过程中出现警告: {str(e)}")
                 # 如果筛选失败，显示原始数据
                 st.info("显示原始数据（筛选功能暂时不可用）")
+                filtered_data = hot_data
             
             st.success(f"筛选结果: {len(filtered_data)} 只股票")
             st.dataframe(filtered_data, use_container_width=True)
@@ -101,8 +211,9 @@ def handle_ths_hot(data_persistence, MODULES, IMPORT_STATUS,
                         stock_name = get_stock_name_by_code(hot_stock_code)
                         k_data = get_stock_data_cached(hot_stock_code)
                         if k_data is not None and not k_data.empty:
-                            # 保存K线图到历史记录
-                            save_kline_image_for_history(k_data, hot_stock_code, stock_name, MODULES)
+                            # 绘制一次K线图，同时用于历史记录和页面显示
+                            kline_outputs = render_kline_outputs(k_data, hot_stock_code, stock_name, MODULES,
+                                                                 ("display", "history"))
                             
                             # 保存到持久化存储
                             metadata = {
@@ -113,8 +224,8 @@ def handle_ths_hot(data_persistence, MODULES, IMPORT_STATUS,
                             data_persistence.save_operation_history("hot_stock_kline", k_data, metadata)
                             
                             st.success("K线图绘制成功！数据已保存到历史记录")
-                            fig = MODULES['k_line']['draw_kline'](k_data, hot_stock_code)
-                            st.pyplot(fig)
+                            if kline_outputs.get("display") is not None:
+                                st.image(kline_outputs["display"], use_column_width=True)
                             
                             # 显示股票信息
                             current_price = k_data.iloc[-1]['price']
@@ -145,25 +256,33 @@ def handle_ths_hot(data_persistence, MODULES, IMPORT_STATUS,
             
             with st.spinner("正在统计概念..."):
                 try:
-                    if 'concept_count' in MODULES['ths_hot']:
+                    if 'ConceptCounter' in MODULES['ths_hot']:
+                        # 增量统计：热榜刷新后只重新拆分发生变化的行
+                        if 'concept_counter' not in st.session_state:
+                            st.session_state.concept_counter = MODULES['ths_hot']['ConceptCounter']()
+                        counter = st.session_state.concept_counter
+                        counter.update(st.session_state.hot_data)
+                        concept_counts = counter.to_frame()
+                    elif 'concept_count' in MODULES['ths_hot']:
                         concept_counts = MODULES['ths_hot']['concept_count'](st.session_state.hot_data)
-                        if concept_counts is not None and not concept_counts.empty:
-                            # 保存到持久化存储
-                            metadata = {
-                                "query_type": "concept_count"
-                            }
-                            data_persistence.save_operation_history("concept_count", concept_counts, metadata)
-                            
-                            st.success("概念统计完成！数据已保存到历史记录")
-                            st.dataframe(concept_counts, use_container_width=True)
-                            
-                            # 显示统计信息
-                            total_concepts = len(concept_counts)
-                            total_stocks = concept_counts['count'].sum()
-                            st.info(f"统计信息: 共发现 {total_concepts} 个概念，涉及 {total_stocks} 只股票")
-                        else:
-                            st.warning("未找到概念数据")
                     else:
+                        concept_counts = None
                         st.error("概念统计功能暂时不可用")
+                    if concept_counts is not None and not concept_counts.empty:
+                        # 保存到持久化存储
+                        metadata = {
+                            "query_type": "concept_count"
+                        }
+                        data_persistence.save_operation_history("concept_count", concept_counts, metadata)
+                        
+                        st.success("概念统计完成！数据已保存到历史记录")
+                        st.dataframe(concept_counts, use_container_width=True)
+                        
+                        # 显示统计信息
+                        total_concepts = len(concept_counts)
+                        total_stocks = concept_counts['count'].sum()
+                        st.info(f"统计信息: 共发现 {total_concepts} 个概念，涉及 {total_stocks} 只股票")
+                    elif concept_counts is not None:
+                        st.warning("未找到概念数据")
                 except Exception as e:
                     st.error(f"概念统计过程中出现错误: {str(e)}")
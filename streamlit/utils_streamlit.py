@@ -9,6 +9,25 @@ import time
 import json
 from datetime import datetime
 import pickle
+import importlib
+import sqlite3
+import threading
+import uuid
+
+# DataFrame数据文件使用Parquet列式存储，未安装pyarrow时退回pickle
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# 性能计时（function目录不可用时不计时）
+try:
+    from perf import timed
+except ImportError:
+    def timed(name=None):
+        return lambda func: func
 
 # 忽略警告信息
 warnings.filterwarnings('ignore')
@@ -19,13 +38,39 @@ for folder in ['image', 'data_cache', 'history']:
     if not os.path.exists(folder):
         os.makedirs(folder)
 
+# 历史记录保留策略：保留最近的天数，以及数据文件占用的总空间上限
+HISTORY_RETENTION_DAYS = 180
+HISTORY_MAX_DATA_BYTES = 2 * 1024 * 1024 * 1024
+# 后台压缩（清理超出保留期限或空间上限的记录）的检查间隔（秒）
+HISTORY_COMPACT_INTERVAL = 60
+# 数据文件所在目录的fsync批量大小：每写入这么多个文件同步一次目录（后台线程也会定期同步）
+FSYNC_BATCH_SIZE = 16
+# 启动扫描时，修改时间在此秒数内的未登记文件可能属于其他进程正在进行的写入，暂不删除
+ORPHAN_GRACE_SECONDS = 60
+# Parquet数据文件的压缩算法与行组大小（按行组读取前N行/后N行）
+PARQUET_COMPRESSION = 'zstd'
+PARQUET_ROW_GROUP_SIZE = 10000
+
 # 数据持久化类
 class DataPersistence:
     def __init__(self):
         self.cache_dir = "data_cache"
         self.history_dir = "history"
+        # 历史记录使用SQLite WAL日志：追加只插入一行，读取最近N条不需要解析全部记录
+        self.history_db = os.path.join(self.history_dir, "operation_history.db")
+        # 旧版本的JSON历史文件，首次启动时自动迁移
         self.history_file = os.path.join(self.history_dir, "operation_history.json")
+        self.retention_days = HISTORY_RETENTION_DAYS
+        self.max_data_bytes = HISTORY_MAX_DATA_BYTES
+        self.fts_available = False
+        self._lock = threading.RLock()
+        self._compact_event = threading.Event()
+        self._pending_syncs = 0
         self.ensure_directories()
+        self._conn = self._open_database()
+        self._migrate_json_history()
+        self.reconcile_data_files()
+        self._start_compactor()
     
     def ensure_directories(self):
         """确保目录存在"""
@@ -33,6 +78,240 @@ class DataPersistence:
             if not os.path.exists(directory):
                 os.makedirs(directory)
     
+    def _open_database(self):
+        """打开历史记录数据库"""
+        conn = sqlite3.connect(self.history_db, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS operation_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                operation_type TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                data_file TEXT
+            )
+        """)
+        # 旧版本数据库没有data_meta列（数据文件的格式、行数、列名和类型）
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(operation_history)")]
+        if "data_meta" not in columns:
+            conn.execute("ALTER TABLE operation_history ADD COLUMN data_meta TEXT")
+        # 数据文件大小，用于按空间上限清理
+        if "data_size" not in columns:
+            conn.execute("ALTER TABLE operation_history ADD COLUMN data_size INTEGER")
+        # 按类型+时间筛选、按时间范围查询的索引
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_type_time ON operation_history (operation_type, timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_time ON operation_history (timestamp)")
+        self._create_fts(conn)
+        conn.commit()
+        return conn
+    
+    def _create_fts(self, conn):
+        """元数据全文索引（FTS5 trigram，支持任意位置的子串匹配）；SQLite不支持时退回LIKE查询"""
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'operation_history_fts'"
+            ).fetchone()
+            if not exists:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE operation_history_fts USING fts5("
+                    "metadata, content='operation_history', content_rowid='id', tokenize='trigram')"
+                )
+                conn.execute("INSERT INTO operation_history_fts (operation_history_fts) VALUES ('rebuild')")
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS operation_history_fts_insert AFTER INSERT ON operation_history BEGIN
+                    INSERT INTO operation_history_fts (rowid, metadata) VALUES (new.id, new.metadata);
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS operation_history_fts_delete AFTER DELETE ON operation_history BEGIN
+                    INSERT INTO operation_history_fts (operation_history_fts, rowid, metadata)
+                    VALUES ('delete', old.id, old.metadata);
+                END
+            """)
+            self.fts_available = True
+        except sqlite3.OperationalError as e:
+            print(f"SQLite不支持FTS5全文索引，元数据搜索使用LIKE: {e}")
+    
+    def _migrate_json_history(self):
+        """把旧版operation_history.json迁移到数据库"""
+        if not os.path.exists(self.history_file):
+            return
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                old_history = json.load(f)
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO operation_history (timestamp, operation_type, metadata, data_file) VALUES (?, ?, ?, ?)",
+                    [(entry.get("timestamp", datetime.now().isoformat()), entry.get("operation_type", "unknown"),
+                      json.dumps(entry.get("metadata") or {}, ensure_ascii=False), entry.get("data_file"))
+                     for entry in old_history]
+                )
+            os.replace(self.history_file, self.history_file + ".migrated")
+        except Exception as e:
+            print(f"迁移旧版历史记录失败: {e}")
+    
+    def _start_compactor(self):
+        """启动后台压缩线程"""
+        thread = threading.Thread(target=self._compact_loop, name="history-compactor", daemon=True)
+        thread.start()
+    
+    def _compact_loop(self):
+        while True:
+            self._compact_event.wait(HISTORY_COMPACT_INTERVAL)
+            self._compact_event.clear()
+            try:
+                self.compact_history()
+                self._sync_cache_dir(force=True)
+            except Exception as e:
+                print(f"压缩历史记录失败: {e}")
+    
+    def _new_data_filename(self, operation_type, extension):
+        """生成不会重复的数据文件名（时间前缀便于人工排查，UUID保证唯一）"""
+        return f"{operation_type}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}.{extension}"
+    
+    def _atomic_write(self, data_filepath, write_func):
+        """先写临时文件并fsync，再原子重命名，崩溃时不会留下写了一半的数据文件"""
+        tmp_filepath = f"{data_filepath}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_filepath, 'wb') as f:
+                write_func(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_filepath, data_filepath)
+        except BaseException:
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+            raise
+        self._sync_cache_dir()
+    
+    def _sync_cache_dir(self, force=False):
+        """批量fsync数据目录，使重命名落盘"""
+        with self._lock:
+            if not force:
+                self._pending_syncs += 1
+                if self._pending_syncs < FSYNC_BATCH_SIZE:
+                    return
+            if self._pending_syncs == 0:
+                return
+            self._pending_syncs = 0
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(self.cache_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+    
+    def reconcile_data_files(self):
+        """启动时核对历史记录与data_cache目录：删除未登记的孤儿文件，清除指向缺失文件的引用"""
+        try:
+            with self._lock:
+                referenced = {row[0] for row in self._conn.execute(
+                    "SELECT data_file FROM operation_history WHERE data_file IS NOT NULL")}
+            existing = set(os.listdir(self.cache_dir))
+            now = time.time()
+            removed = 0
+            for filename in existing - referenced:
+                file_path = os.path.join(self.cache_dir, filename)
+                if os.path.isfile(file_path) and now - os.path.getmtime(file_path) > ORPHAN_GRACE_SECONDS:
+                    os.remove(file_path)
+                    removed += 1
+            missing = referenced - existing
+            if missing:
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        "UPDATE operation_history SET data_file = NULL, data_meta = NULL WHERE data_file = ?",
+                        [(filename,) for filename in missing]
+                    )
+            # 旧记录没有数据文件大小，补充后才能按空间上限清理
+            with self._lock:
+                unsized = self._conn.execute(
+                    "SELECT id, data_file FROM operation_history WHERE data_file IS NOT NULL AND data_size IS NULL"
+                ).fetchall()
+            sizes = [(os.path.getsize(os.path.join(self.cache_dir, f)), row_id) for row_id, f in unsized
+                     if f in existing]
+            if sizes:
+                with self._lock, self._conn:
+                    self._conn.executemany("UPDATE operation_history SET data_size = ? WHERE id = ?", sizes)
+            if removed or missing:
+                print(f"历史数据一致性检查: 删除{removed}个孤儿文件，修复{len(missing)}条缺失文件的记录")
+            return removed, len(missing)
+        except Exception as e:
+            print(f"历史数据一致性检查失败: {e}")
+            return 0, 0
+    
+    def compact_history(self):
+        """删除超出保留天数的记录，以及数据文件总大小超出上限时最旧的记录，同时删除其数据文件"""
+        cutoff = (datetime.now() - pd.Timedelta(days=self.retention_days)).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, data_file FROM operation_history WHERE timestamp < ?", (cutoff,)
+            ).fetchall()
+            # 总大小超出上限时，从新到旧累计数据文件大小，超出上限的部分全部删除
+            total_size = self._conn.execute("SELECT COALESCE(SUM(data_size), 0) FROM operation_history").fetchone()[0]
+            if total_size > self.max_data_bytes:
+                rows += self._conn.execute("""
+                    SELECT id, data_file FROM (
+                        SELECT id, data_file, timestamp,
+                               SUM(COALESCE(data_size, 0)) OVER (ORDER BY id DESC) AS total_size
+                        FROM operation_history
+                    ) WHERE total_size > ? AND timestamp >= ?
+                """, (self.max_data_bytes, cutoff)).fetchall()
+            if not rows:
+                return 0
+            with self._conn:
+                self._conn.executemany("DELETE FROM operation_history WHERE id = ?", [(row[0],) for row in rows])
+        for _, data_file in rows:
+            if data_file:
+                old_file_path = os.path.join(self.cache_dir, data_file)
+                if os.path.exists(old_file_path):
+                    os.remove(old_file_path)
+        return len(rows)
+    
+    @staticmethod
+    def _row_to_entry(row):
+        return {
+            "id": row[0],
+            "timestamp": row[1],
+            "operation_type": row[2],
+            "metadata": json.loads(row[3]) if row[3] else {},
+            "data_file": row[4],
+            "data_meta": json.loads(row[5]) if row[5] else None
+        }
+    
+    @staticmethod
+    def _frame_meta(data, data_format):
+        """DataFrame的行数、列名和类型，面板无需读取数据即可显示"""
+        return {
+            "format": data_format,
+            "rows": int(data.shape[0]),
+            "columns": [str(c) for c in data.columns],
+            "dtypes": [str(t) for t in data.dtypes]
+        }
+    
+    @timed('history.write_payload')
+    def _write_data_file(self, operation_type, data):
+        """写入数据文件，返回(文件名, 元数据)；DataFrame优先存为Parquet"""
+        if isinstance(data, pd.DataFrame) and PYARROW_AVAILABLE:
+            try:
+                table = pa.Table.from_pandas(data)
+                data_filename = self._new_data_filename(operation_type, "parquet")
+                self._atomic_write(
+                    os.path.join(self.cache_dir, data_filename),
+                    lambda f: pq.write_table(table, f, compression=PARQUET_COMPRESSION,
+                                             row_group_size=PARQUET_ROW_GROUP_SIZE)
+                )
+                return data_filename, self._frame_meta(data, "parquet")
+            except (pa.ArrowException, TypeError, ValueError):
+                # 混合类型的object列等无法转换为Arrow，改用pickle
+                pass
+        data_filename = self._new_data_filename(operation_type, "pkl")
+        self._atomic_write(os.path.join(self.cache_dir, data_filename), lambda f: pickle.dump(data, f))
+        if isinstance(data, pd.DataFrame):
+            return data_filename, self._frame_meta(data, "pickle")
+        return data_filename, {"format": "pickle", "type": type(data).__name__}
+    
+    @timed('history.save')
     def save_operation_history(self, operation_type, data, metadata=None):
         """保存操作历史"""
         try:
@@ -40,38 +319,29 @@ class DataPersistence:
                 "timestamp": datetime.now().isoformat(),
                 "operation_type": operation_type,
                 "metadata": metadata or {},
-                "data_file": None
+                "data_file": None,
+                "data_meta": None
             }
             
             # 保存数据到单独文件
             if data is not None:
-                timestamp = int(time.time())
-                data_filename = f"{operation_type}_{timestamp}.pkl"
-                data_filepath = os.path.join(self.cache_dir, data_filename)
-                
-                with open(data_filepath, 'wb') as f:
-                    pickle.dump(data, f)
-                
-                history_entry["data_file"] = data_filename
-            
-            # 读取现有历史
-            history = self.load_operation_history()
-            history.append(history_entry)
-            
-            # 保持最近100条记录
-            if len(history) > 100:
-                # 删除旧的数据文件
-                old_entry = history[0]
-                if old_entry.get("data_file"):
-                    old_file_path = os.path.join(self.cache_dir, old_entry["data_file"])
-                    if os.path.exists(old_file_path):
-                        os.remove(old_file_path)
-                history = history[-100:]
+                history_entry["data_file"], history_entry["data_meta"] = self._write_data_file(operation_type, data)
+                data_size = os.path.getsize(os.path.join(self.cache_dir, history_entry["data_file"]))
+            else:
+                data_size = None
             
-            # 保存历史记录
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
+            # 追加一条记录
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO operation_history (timestamp, operation_type, metadata, data_file, data_meta, data_size) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (history_entry["timestamp"], operation_type,
+                     json.dumps(history_entry["metadata"], ensure_ascii=False, default=str), history_entry["data_file"],
+                     json.dumps(history_entry["data_meta"]) if history_entry["data_meta"] else None, data_size)
+                )
             
+            # 通知后台线程检查保留策略
+            self._compact_event.set()
             return True
         except Exception as e:
             st.error(f"保存操作历史失败: {str(e)}")
@@ -80,26 +350,161 @@ class DataPersistence:
     def load_operation_history(self):
         """加载操作历史"""
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, timestamp, operation_type, metadata, data_file, data_meta FROM operation_history ORDER BY id"
+                ).fetchall()
+            return [self._row_to_entry(row) for row in rows]
+        except Exception as e:
+            st.error(f"加载操作历史失败: {str(e)}")
+            return []
+    
+    @timed('history.tail')
+    def tail_operation_history(self, n=5):
+        """加载最近n条操作历史（按时间先后排列）"""
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, timestamp, operation_type, metadata, data_file, data_meta FROM operation_history "
+                    "ORDER BY id DESC LIMIT ?", (n,)
+                ).fetchall()
+            return [self._row_to_entry(row) for row in reversed(rows)]
+        except Exception as e:
+            st.error(f"加载操作历史失败: {str(e)}")
             return []
+    
+    @staticmethod
+    def _to_timestamp(value):
+        return value.isoformat() if isinstance(value, datetime) else str(value)
+    
+    def _filter_clause(self, operation_type=None, since=None, until=None, keyword=None):
+        """构造筛选条件：操作类型、时间范围[since, until)、元数据关键字"""
+        conditions, params = [], []
+        if operation_type:
+            conditions.append("operation_type = ?")
+            params.append(operation_type)
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(self._to_timestamp(since))
+        if until:
+            conditions.append("timestamp < ?")
+            params.append(self._to_timestamp(until))
+        keyword = (keyword or '').strip()
+        if keyword:
+            # trigram索引只能匹配3个字符及以上的关键字，更短的关键字用LIKE
+            if self.fts_available and len(keyword) >= 3:
+                conditions.append("id IN (SELECT rowid FROM operation_history_fts WHERE operation_history_fts MATCH ?)")
+                params.append('"' + keyword.replace('"', '""') + '"')
+            else:
+                conditions.append("metadata LIKE ? ESCAPE '\\'")
+                escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                params.append(f"%{escaped}%")
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+    
+    @timed('history.query')
+    def query_operation_history(self, operation_type=None, since=None, limit=20, offset=0, until=None, keyword=None):
+        """分页查询操作历史（按时间倒序），只读取元数据不读取数据文件"""
+        try:
+            where, params = self._filter_clause(operation_type, since, until, keyword)
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, timestamp, operation_type, metadata, data_file, data_meta FROM operation_history"
+                    f"{where} ORDER BY id DESC LIMIT ? OFFSET ?", params + [limit, offset]
+                ).fetchall()
+            return [self._row_to_entry(row) for row in rows]
         except Exception as e:
             st.error(f"加载操作历史失败: {str(e)}")
             return []
     
-    def load_operation_data(self, data_filename):
-        """加载操作数据"""
+    @timed('history.count')
+    def count_operation_history(self, operation_type=None, since=None, until=None, keyword=None):
+        """统计符合条件的操作历史条数"""
+        try:
+            where, params = self._filter_clause(operation_type, since, until, keyword)
+            with self._lock:
+                return self._conn.execute(f"SELECT COUNT(*) FROM operation_history{where}", params).fetchone()[0]
+        except Exception as e:
+            st.error(f"统计操作历史失败: {str(e)}")
+            return 0
+    
+    def count_by_type(self, since=None, until=None, keyword=None):
+        """按操作类型分组统计条数，返回{操作类型: 条数}"""
+        try:
+            where, params = self._filter_clause(None, since, until, keyword)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT operation_type, COUNT(*) FROM operation_history{where} "
+                    "GROUP BY operation_type ORDER BY COUNT(*) DESC", params
+                ).fetchall()
+            return dict(rows)
+        except Exception as e:
+            st.error(f"统计操作历史失败: {str(e)}")
+            return {}
+    
+    def count_by_day(self, operation_type=None, since=None, until=None, keyword=None):
+        """按日期分组统计条数，返回DataFrame(date, count)"""
+        try:
+            where, params = self._filter_clause(operation_type, since, until, keyword)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT substr(timestamp, 1, 10) AS day, COUNT(*) FROM operation_history{where} "
+                    "GROUP BY day ORDER BY day", params
+                ).fetchall()
+            return pd.DataFrame(rows, columns=["date", "count"])
+        except Exception as e:
+            st.error(f"统计操作历史失败: {str(e)}")
+            return pd.DataFrame(columns=["date", "count"])
+    
+    @timed('history.load_data')
+    def load_operation_data(self, data_filename, columns=None, head=None, tail=None):
+        """加载操作数据；对DataFrame可只读取部分列(columns)或前head行/后tail行"""
         try:
             data_filepath = os.path.join(self.cache_dir, data_filename)
-            if os.path.exists(data_filepath):
-                with open(data_filepath, 'rb') as f:
-                    return pickle.load(f)
-            return None
+            if not os.path.exists(data_filepath):
+                return None
+            if data_filename.endswith(".parquet"):
+                return self._read_parquet(data_filepath, columns, head, tail)
+            with open(data_filepath, 'rb') as f:
+                data = pickle.load(f)
+            if isinstance(data, pd.DataFrame):
+                if columns is not None:
+                    data = data[columns]
+                if head is not None:
+                    data = data.head(head)
+                elif tail is not None:
+                    data = data.tail(tail)
+            return data
         except Exception as e:
             st.error(f"加载操作数据失败: {str(e)}")
             return None
     
+    @staticmethod
+    def _read_parquet(data_filepath, columns=None, head=None, tail=None):
+        """以内存映射方式读取Parquet，前N行/后N行只读取需要的行组"""
+        if head is None and tail is None:
+            return pq.read_table(data_filepath, columns=columns, memory_map=True).to_pandas()
+        parquet_file = pq.ParquetFile(data_filepath, memory_map=True)
+        metadata = parquet_file.metadata
+        group_indices = list(range(metadata.num_row_groups))
+        wanted = head if head is not None else tail
+        if tail is not None:
+            group_indices.reverse()
+        selected, row_count = [], 0
+        for i in group_indices:
+            if row_count >= wanted:
+                break
+            selected.append(i)
+            row_count += metadata.row_group(i).num_rows
+        if not selected:
+            return parquet_file.schema_arrow.empty_table().to_pandas()
+        table = parquet_file.read_row_groups(sorted(selected), columns=columns, use_pandas_metadata=True)
+        table = table.slice(0, wanted) if head is not None else table.slice(max(table.num_rows - wanted, 0))
+        data = table.to_pandas()
+        if tail is not None and isinstance(data.index, pd.RangeIndex):
+            # 与完整读取时的行号保持一致
+            data.index = pd.RangeIndex(metadata.num_rows - len(data), metadata.num_rows)
+        return data
+    
     def clear_history(self):
         """清空历史记录"""
         try:
@@ -109,9 +514,9 @@ class DataPersistence:
                 if os.path.isfile(file_path):
                     os.remove(file_path)
             
-            # 清空历史记录文件
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump([], f)
+            # 清空历史记录
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM operation_history")
             
             return True
         except Exception as e:
@@ -124,21 +529,29 @@ def safe_import():
     modules = {}
     import_status = {}
     
+    # 按模块名导入（function目录已由function包加入sys.path），与function目录中的模块互相导入时是同一个模块对象
     module_configs = [
-        ('api_search', ['function.api_search_draw'], ['api_search_code_draw', 'api_search_name_draw']),
-        ('db_search', ['function.db_search_draw'], ['database_search_name_draw', 'database_search_code_draw']),
-        ('lhb', ['function.find_lhs'], ['search_in_lh', 'find_lhb']),
-        ('ths_hot', ['function.ths_hot'], ['code_draw', 'concept_count']),
-        ('db_connect', ['function.db_connect'], ['db_connect']),
-        ('flush_db', ['function.flush_db'], ['flush_database']),
-        ('k_line', ['function.k_line'], ['draw_kline'])
+        ('api_search', ['api_search_draw'], ['api_search_code_draw', 'api_search_name_draw',
+                                             'api_get_stock_name', 'api_get_stock_code']),
+        ('db_search', ['db_search_draw'], ['database_search_name_draw', 'database_search_code_draw',
+                                           'database_get_stock_name', 'database_get_stock_code']),
+        ('lhb', ['find_lhs'], ['search_in_lh', 'find_lhb', 'find_lhb_many', 'iter_lhb_many', 'list_lhb_codes',
+                               'resolve_lhb_codes']),
+        ('ths_hot', ['ths_hot'], ['code_draw', 'concept_count', 'ConceptCounter']),
+        ('quotes', ['quote_fetch'], ['fetch_quotes', 'iter_quotes']),
+        ('screener', ['screener'], ['run_screen', 'compile_expression', 'ScreenExpressionError',
+                                    'DEFAULT_EXPRESSION', 'DEFAULT_SORT', 'QUOTE_COLUMNS', 'SCREEN_BUDGET']),
+        ('db_connect', ['db_connect'], ['db_connect', 'get_engine', 'get_pool_stats']),
+        ('flush_db', ['flush_db'], ['flush_database']),
+        ('k_line', ['k_line'], ['draw_kline']),
+        ('kline_cache', ['kline_cache'], ['render_kline_cached', 'get_kline_cache'])
     ]
     
     for module_name, import_paths, function_names in module_configs:
         try:
             module_dict = {}
             for path in import_paths:
-                module = __import__(path, fromlist=[''])
+                module = importlib.import_module(path)
                 for func_name in function_names:
                     if hasattr(module, func_name):
                         module_dict[func_name] = getattr(module, func_name)
@@ -158,7 +571,8 @@ def safe_import():
 def get_all_stock_codes():
     """获取所有股票代码和名称"""
     try:
-        return adata.stock.info.all_code()
+        from api_search_draw import api_get_stock_listing
+        return api_get_stock_listing()
     except Exception as e:
         st.error(f"获取股票代码失败: {e}")
         return pd.DataFrame()
@@ -167,18 +581,19 @@ def get_all_stock_codes():
 def get_stock_data_cached(stock_code):
     """缓存股票数据获取"""
     try:
-        return adata.stock.market.get_market_min(stock_code)
+        from data_fetch import get_fetcher
+        return get_fetcher().fetch('market_min', stock_code)
     except Exception as e:
         return None
 
 def get_stock_name_by_code(stock_code):
     """通过股票代码获取股票名称"""
     try:
-        all_codes = get_all_stock_codes()
-        if not all_codes.empty:
-            result = all_codes[all_codes['stock_code'] == stock_code]
-            if not result.empty:
-                return result['short_name'].values[0]
+        # 代码表索引所有会话共享，O(1)查找
+        from api_search_draw import api_get_stock_name
+        result = api_get_stock_name(stock_code)
+        if result:
+            return result
     except:
         pass
     return "未知"
@@ -186,48 +601,73 @@ def get_stock_name_by_code(stock_code):
 def get_stock_code_by_name(short_name):
     """通过股票名称获取股票代码"""
     try:
-        all_codes = get_all_stock_codes()
-        if not all_codes.empty:
-            result = all_codes[all_codes['short_name'] == short_name]
-            if not result.empty:
-                return result['stock_code'].values[0]
+        from api_search_draw import api_get_stock_code
+        return api_get_stock_code(short_name)
     except:
         pass
     return None
 
-def save_kline_image(df, stock_code, stock_name, MODULES):
-    """保存K线图"""
+# K线图各输出目标的DPI（屏幕显示用低DPI，归档用高DPI）
+KLINE_DPI = {
+    "display": 100,
+    "history": 300,
+    "archive": 300
+}
+
+# K线图各输出目标的图片格式（可改为webp以减小体积），保存的文件扩展名与格式一致
+KLINE_FORMAT = {
+    "display": "png",
+    "history": "png",
+    "archive": "png"
+}
+
+def render_kline_outputs(df, stock_code, stock_name, MODULES, targets=("display", "history", "archive")):
+    """绘制一次K线图，编码结果分发到各输出目标（数据未变化时直接使用缓存）"""
     try:
-        fig = MODULES['k_line']['draw_kline'](df, stock_code)
+        specs = [(KLINE_DPI[t], KLINE_FORMAT[t]) for t in targets]
+        images = MODULES['kline_cache']['render_kline_cached'](df, stock_code, specs)
+        cache = MODULES['kline_cache']['get_kline_cache']()
+        outputs = {}
         timestamp = int(time.time())
-        filename = f"image/{stock_code}_{timestamp}.png"
-        fig.savefig(filename, dpi=300, bbox_inches='tight')
-        plt.close(fig)
-        return filename
+        for target, spec in zip(targets, specs):
+            cache_key, image_bytes = images[spec]
+            if target == "display":
+                # 页面显示直接使用内存中的图片字节
+                outputs[target] = image_bytes
+                continue
+            extension = spec[1]
+            if target == "history":
+                filename = f"image/{stock_code}.{extension}"
+            else:
+                # 数据未变化时复用上一张归档图片，不再重复写入
+                latest = cache.latest_entry(stock_code)
+                if latest and latest.get("key") == cache_key and os.path.exists(latest["file"]):
+                    outputs[target] = latest["file"]
+                    continue
+                filename = f"image/{stock_code}_{timestamp}.{extension}"
+            with open(filename, 'wb') as f:
+                f.write(image_bytes)
+            if target == "archive":
+                cache.record_latest(stock_code, filename, cache_key)
+            outputs[target] = filename
+        return outputs
     except Exception as e:
         st.error(f"保存K线图失败: {str(e)}")
-        return None
+        return {}
+
+def save_kline_image(df, stock_code, stock_name, MODULES):
+    """保存K线图"""
+    return render_kline_outputs(df, stock_code, stock_name, MODULES, ("archive",)).get("archive")
 
 def save_kline_image_for_history(df, stock_code, stock_name, MODULES):
     """为历史记录保存K线图（使用stock_code命名）"""
-    try:
-        fig = MODULES['k_line']['draw_kline'](df, stock_code)
-        filename = f"image/{stock_code}.png"
-        fig.savefig(filename, dpi=300, bbox_inches='tight')
-        plt.close(fig)
-        return filename
-    except Exception as e:
-        st.error(f"保存K线图失败: {str(e)}")
-        return None
+    return render_kline_outputs(df, stock_code, stock_name, MODULES, ("history",)).get("history")
 
 def get_latest_kline_image(stock_code):
     """获取最新的K线图"""
     try:
-        image_files = [f for f in os.listdir('image') if f.startswith(f"{stock_code}_")]
-        if image_files:
-            image_files.sort(key=lambda x: int(x.split('_')[1].split('.')[0]), reverse=True)
-            return os.path.join('image', image_files[0])
-        return None
+        from kline_cache import get_kline_cache
+        return get_kline_cache().latest_image(stock_code)
     except Exception as e:
         return None
 
@@ -235,7 +675,7 @@ def get_stock_name_from_db(stock_code):
     """从数据库获取股票名称"""
     try:
         # 使用新增的不绘图函数
-        from function.db_search_draw import database_get_stock_name
+        from db_search_draw import database_get_stock_name
         result = database_get_stock_name(stock_code)
         return result if result else None
     except Exception as e:
@@ -246,7 +686,7 @@ def get_stock_code_from_db(short_name):
     """从数据库获取股票代码"""
     try:
         # 使用新增的不绘图函数
-        from function.db_search_draw import database_get_stock_code
+        from db_search_draw import database_get_stock_code
         result = database_get_stock_code(short_name)
         return result if result else None
     except Exception as e:
@@ -256,13 +696,22 @@ def get_stock_code_from_db(short_name):
 def fuzzy_search_stocks_from_db(keyword):
     """从数据库模糊查询股票"""
     try:
-        from function.db_search_draw import database_fuzzy_search
+        from db_search_draw import database_fuzzy_search
         result = database_fuzzy_search(keyword)
         return result if result is not None else None
     except Exception as e:
         st.error(f"数据库模糊查询失败: {str(e)}")
         return None
 
+def search_stocks_from_db(keyword, limit=10):
+    """边输入边搜索股票（代码前缀/名称/拼音首字母）"""
+    try:
+        from db_search_draw import database_search_stocks
+        return database_search_stocks(keyword, limit)
+    except Exception as e:
+        st.error(f"股票搜索失败: {str(e)}")
+        return None
+
 def query_stock_data(stock_code, stock_name, data_source, get_stock_name_from_db, get_stock_code_from_db):
     """查询股票数据"""
     try:
@@ -54,7 +54,12 @@ def get_usage_guide():
     - 支持按价格、涨跌幅、成交量筛选
     - 可绘制热榜股票的K线图
     
-    ### 4. 数据库管理
+    ### 4. 全市场选股
+    **功能：**
+    - 分批获取全市场实时行情，按自定义表达式筛选
+    - 按指定列排序返回前N只股票，并统计其所属概念
+
+    ### 5. 数据库管理
     **功能：**
     - 测试数据库连接状态
     - 更新本地股票数据库
@@ -79,6 +84,7 @@ def get_technical_details():
     - db_search_draw.py: 数据库查询模块
     - find_lhs.py: 龙虎榜查询模块
     - ths_hot.py: 同花顺热榜模块
+    - screener.py: 全市场选股模块
     - k_line.py: K线图绘制模块
     - db_connect.py: 数据库连接模块
     - flush_db.py: 数据库更新模块
@@ -102,7 +108,11 @@ def get_quick_help():
     - 点击"获取同花顺热榜"获取热门股票
     - 使用筛选功能过滤数据
     
-    **4. 数据库管理**
+    **4. 全市场选股**
+    - 输入筛选表达式，例如 change_pct > 3 and price < 20
+    - 点击"开始选股"
+    
+    **5. 数据库管理**
     - 先测试数据库连接
     - 需要时更新数据库
     
@@ -40,6 +40,16 @@ def test_imports():
         from streamlit.history_streamlit import show_history_panel
         print("✅ history_streamlit 模块导入成功")
         
+        # 测试性能面板模块
+        print("⏱️ 测试 perf_streamlit 模块...")
+        from streamlit.perf_streamlit import show_perf_panel
+        print("✅ perf_streamlit 模块导入成功")
+        
+        # 测试全市场选股模块
+        print("🔎 测试 screener_streamlit 模块...")
+        from streamlit.screener_streamlit import handle_screener
+        print("✅ screener_streamlit 模块导入成功")
+        
         # 测试主模块
         print("🚀 测试 main 模块...")
         from main import main
@@ -106,6 +116,234 @@ def test_safe_import():
         print(f"❌ 安全导入测试失败: {e}")
         return False
 
+# 导入耗时预算（秒）：导入只应包含模块本身的加载开销，不应包含网络请求
+IMPORT_TIME_BUDGET = 10.0
+
+IMPORT_IO_CHECK_SCRIPT = """
+import json, os, socket, sys, time
+# 页面模块按模块名导入；仓库根目录放在最后，streamlit指向已安装的streamlit而不是同名的页面目录
+sys.path[:] = [path for path in sys.path if path not in ('', os.getcwd())]
+sys.path.insert(0, os.path.join(os.getcwd(), 'streamlit'))
+sys.path.append(os.getcwd())
+attempts = []
+def _blocked_connect(self, address, *args):
+    attempts.append(str(address))
+    raise OSError('network disabled during import check')
+def _blocked_getaddrinfo(host, *args, **kwargs):
+    attempts.append(str(host))
+    raise socket.gaierror('network disabled during import check')
+socket.socket.connect = _blocked_connect
+socket.socket.connect_ex = _blocked_connect
+socket.getaddrinfo = _blocked_getaddrinfo
+import function
+modules = list(function.MODULE_NAMES)
+modules += ['utils_streamlit', 'stock_streamlit', 'lhb_streamlit', 'ths_streamlit', 'db_streamlit',
+            'history_streamlit', 'perf_streamlit', 'screener_streamlit']
+failed = {}
+start = time.perf_counter()
+for name in modules:
+    try:
+        __import__(name)
+    except Exception as e:
+        failed[name] = f'{type(e).__name__}: {e}'
+elapsed = time.perf_counter() - start
+# 每个功能模块只能加载一份：不能再以function.xxx的名称出现，所有模块共用同一个数据调用层
+duplicates = sorted(name for name in sys.modules if name.startswith('function.'))
+data_fetch = sys.modules.get('data_fetch')
+fetchers = sorted(name for name, module in list(sys.modules.items())
+                  if data_fetch is not None and hasattr(module, 'get_fetcher')
+                  and module.get_fetcher is not data_fetch.get_fetcher)
+# 数据库查询和连接池面板使用同一个db_connect模块中的引擎
+db_connect = sys.modules.get('db_connect')
+engines = sorted(name for name, module in list(sys.modules.items())
+                 if db_connect is not None and hasattr(module, 'get_engine')
+                 and os.path.dirname(getattr(module, '__file__', None) or '').startswith(os.getcwd())
+                 and module.get_engine is not db_connect.get_engine)
+print(json.dumps({'attempts': attempts, 'failed': failed, 'elapsed': elapsed,
+                  'duplicates': duplicates, 'fetchers': fetchers, 'engines': engines}))
+"""
+
+def test_import_no_io():
+    """测试function和streamlit目录中的模块都能导入、导入时不发起网络请求，且导入耗时在预算内"""
+    print("\n🔍 测试导入时无网络I/O...")
+    
+    try:
+        import json
+        import os
+        import subprocess
+        import sys
+        
+        # 在独立进程中导入，避免受当前进程已导入模块的影响
+        completed = subprocess.run(
+            [sys.executable, "-c", IMPORT_IO_CHECK_SCRIPT],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=120
+        )
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        
+        for name, error in result['failed'].items():
+            print(f"❌ {name} 导入失败: {error}")
+        print(f"⏱️ 导入耗时: {result['elapsed']:.2f}s (预算 {IMPORT_TIME_BUDGET:.0f}s)")
+        
+        assert not result['failed'], f"模块导入失败: {', '.join(result['failed'])}"
+        assert not result['attempts'], f"导入时发起了网络请求: {result['attempts']}"
+        assert not result['duplicates'], f"模块被重复加载: {result['duplicates']}"
+        assert not result['fetchers'], f"存在另一份数据调用层: {result['fetchers']}"
+        assert not result['engines'], f"存在另一份数据库连接池: {result['engines']}"
+        assert result['elapsed'] < IMPORT_TIME_BUDGET, f"导入耗时超出预算: {result['elapsed']:.2f}s"
+        print("✅ 导入时没有网络I/O")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 导入I/O测试失败: {e}")
+        # 在pytest中运行时让测试失败
+        raise
+
+def test_data_fetch():
+    """用本地假数据后端测试数据调用层的并发、重试和超时"""
+    print("\n🔍 测试数据调用层...")
+    
+    try:
+        import sys
+        import os
+        import time
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'function'))
+        from data_fetch import DataFetcher, FetchTimeout
+        from data_source import LiveDataSource
+        
+        calls = {'flaky': 0}
+        def slow(value):
+            time.sleep(0.2)
+            return value
+        def flaky():
+            calls['flaky'] += 1
+            if calls['flaky'] < 2:
+                raise ConnectionError('fake network error')
+            return 'ok'
+        backend = {'slow': slow, 'flaky': flaky, 'hang': lambda: time.sleep(1.0)}
+        # 假接口不设置主机，不受限速影响
+        endpoints = {'slow': (None, 5.0), 'flaky': (None, 5.0), 'hang': (None, 0.1)}
+        fetcher = DataFetcher(LiveDataSource(backend), endpoints=endpoints, max_workers=4, backoff=0.01)
+        
+        # 4个独立请求应同时执行
+        start = time.perf_counter()
+        futures = [fetcher.submit('slow', i) for i in range(4)]
+        assert [fetcher.result(f) for f in futures] == [0, 1, 2, 3]
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.6, f"请求没有并发执行: {elapsed:.2f}s"
+        print(f"✅ 4个请求并发完成: {elapsed:.2f}s")
+        
+        assert fetcher.fetch('flaky') == 'ok' and calls['flaky'] == 2
+        print("✅ 失败后自动重试")
+        
+        try:
+            fetcher.fetch('hang')
+            raise AssertionError("超时没有生效")
+        except FetchTimeout:
+            print("✅ 超时抛出FetchTimeout")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 数据调用层测试失败: {e}")
+        # 在pytest中运行时让测试失败
+        raise
+
+def test_screen_expression():
+    """测试选股表达式：允许的表达式按行计算，不安全或不支持的表达式在解析时拒绝"""
+    print("\n🔍 测试选股表达式...")
+    
+    try:
+        import sys
+        import os
+        import pandas as pd
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'function'))
+        from screener import compile_expression, evaluate_expression, ScreenExpressionError
+        
+        df = pd.DataFrame({
+            'stock_code': ['600000', '300001', '000001'],
+            'short_name': ['浦发银行', '特锐德', '平安银行'],
+            'price': [8.0, 25.0, 12.0],
+            'change_pct': [1.0, -2.0, 3.0]
+        })
+        allowed = {
+            "change_pct > 0 and not stock_code.startswith('300') and price <= 20": [True, False, True],
+            "stock_code.startswith(('300', '688')) or price * 2 > 20": [False, True, True],
+            "short_name.contains(('浦发', '特锐'))": [True, True, False],
+            "0 < change_pct < 2 or stock_code in ('000001',)": [True, False, True]
+        }
+        for expression, expected in allowed.items():
+            assert evaluate_expression(df, expression).tolist() == expected, expression
+        print(f"✅ {len(allowed)}个表达式计算正确")
+        
+        rejected = [
+            "'x' * 999999999 * 999999999",
+            "short_name * 999999999",
+            "stock_code.startswith(300)",
+            "short_name.contains(())",
+            "price.__class__",
+            "__import__('os').system('ls')",
+            "unknown_column > 1",
+            "[c for c in stock_code]"
+        ]
+        for expression in rejected:
+            try:
+                compile_expression(expression, list(df.columns))
+                raise AssertionError(f"没有拒绝: {expression}")
+            except ScreenExpressionError:
+                pass
+        print(f"✅ {len(rejected)}个不安全或不支持的表达式被拒绝")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 选股表达式测试失败: {e}")
+        # 在pytest中运行时让测试失败
+        raise
+
+def test_run_screen_without_concepts():
+    """测试概念接口全部失败时选股仍返回行情结果，概念统计为空"""
+    print("\n🔍 测试概念查询失败时的选股...")
+    
+    try:
+        import sys
+        import os
+        import pandas as pd
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'function'))
+        import screener
+        from data_fetch import DataFetcher
+        from data_source import LiveDataSource
+        from quote_fetch import QuoteFetchResult
+        
+        quotes = pd.DataFrame({
+            'stock_code': ['600000', '300001', '000001'],
+            'short_name': ['浦发银行', '特锐德', '平安银行'],
+            'price': [8.0, 25.0, 12.0],
+            'change': [0.1, -0.5, 0.3],
+            'change_pct': [1.0, -2.0, 3.0],
+            'volume': [1e6, 2e6, 3e6],
+            'amount': [1e7, 2e7, 3e7]
+        })
+        def concept_ths(code):
+            raise ConnectionError('fake network error')
+        fetcher = DataFetcher(LiveDataSource({'concept_ths': concept_ths}), endpoints={'concept_ths': (None, 1.0)},
+                              max_workers=2, backoff=0.01)
+        original = screener.fetch_quotes, screener.get_fetcher
+        screener.fetch_quotes = lambda codes, batch_size=None, deadline=None: QuoteFetchResult(quotes.copy(), [], [])
+        screener.get_fetcher = lambda: fetcher
+        try:
+            result = screener.run_screen(codes=quotes['stock_code'].tolist(), budget=5.0)
+        finally:
+            screener.fetch_quotes, screener.get_fetcher = original
+        
+        assert result.stocks['stock_code'].tolist() == ['000001', '600000'], result.stocks
+        assert result.concepts is not None and result.concepts.empty
+        print("✅ 概念查询全部失败时仍返回选股结果")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 概念查询失败时的选股测试失败: {e}")
+        # 在pytest中运行时让测试失败
+        raise
+
 def main():
     """主测试函数"""
     print("🚀 开始模块化测试...\n")
@@ -114,14 +352,21 @@ def main():
     tests = [
         ("模块导入测试", test_imports),
         ("数据持久化测试", test_data_persistence),
-        ("安全导入测试", test_safe_import)
+        ("安全导入测试", test_safe_import),
+        ("导入无I/O测试", test_import_no_io),
+        ("数据调用层测试", test_data_fetch),
+        ("选股表达式测试", test_screen_expression),
+        ("概念查询失败选股测试", test_run_screen_without_concepts)
     ]
     
     results = []
     for test_name, test_func in tests:
         print(f"🔍 {test_name}")
         print("-" * 50)
-        result = test_func()
+        try:
+            result = test_func()
+        except Exception:
+            result = False
         results.append((test_name, result))
         print()
     